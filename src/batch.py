@@ -0,0 +1,226 @@
+"""
+无界面的批量转换命令行入口。
+
+    python batch.py 笔记目录 其他.txt -o 输出目录 -j 8 --summary 结果.json
+
+目录参数会递归查找其中所有 .txt 文件。指定输出目录时保留源目录结构，
+否则 pdf 与源文件放在一起。每个工作进程启动时预先加载一次字体，
+之后该进程中的所有转换都复用已加载的字体。
+
+    python batch.py 笔记目录 --bundle 合集.pdf
+
+--bundle 将找到的所有文件按顺序合并为一个 pdf（见 main.main_bundle）。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import rlab_stage_2 as lab
+import rlab_stage_3 as main
+
+
+def warm_fonts(font_normal, font_bold, snapshot_dir=None, lazy=False):
+    """
+    预先解析并注册字体、加载字形宽度表（用作工作进程的初始化函数）。
+    snapshot_dir 为字体快照目录（见 lab.FontCache）。
+    lazy=True 时只加载宽度表，字体等到第一次真正渲染时才解析（使用转换缓存时多数文件无需渲染）。
+    """
+    if snapshot_dir:
+        lab.font_cache.snapshot_dir = snapshot_dir
+    if not lazy:
+        lab.font_cache.register('normal', font_normal)
+        lab.font_cache.register('bold', font_bold)
+    lab.WidthTable.load(font_normal)
+    lab.WidthTable.load(font_bold)
+
+
+def collect_jobs(paths, output_dir=None):
+    """
+    展开命令行中的文件与目录，返回 [(源文件, 输出文件), ...]。
+    输出路径互不相同：重名时在文件名后追加序号。
+    """
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(".txt"):
+                        file_path = os.path.join(root, name)
+                        sources.append((file_path, os.path.relpath(file_path, path)))
+        else:
+            sources.append((path, os.path.basename(path)))
+
+    jobs  = []
+    taken = set()
+    for file_path, relative in sources:
+        if output_dir:
+            output = os.path.join(output_dir, lab.cut_extname(relative) + ".pdf")
+        else:
+            output = lab.cut_extname(file_path) + ".pdf"
+
+        candidate, n = output, 1
+        while os.path.normcase(os.path.abspath(candidate)) in taken:
+            n += 1
+            candidate = "%s-%s.pdf" % (lab.cut_extname(output), n)
+        taken.add(os.path.normcase(os.path.abspath(candidate)))
+        jobs.append((file_path, candidate))
+    return jobs
+
+
+def convert(file_path, output, font_normal, font_bold, instrument=False, compression=None, catalog=True,
+            deterministic=False, pdf_cache_dir=None, chapter_cache_dir=None):
+    """
+    转换单个文件，返回结果记录（失败时记录错误而不抛出），成功时记录输出文件字节数。
+    instrument=True 时附带分阶段计时报告；compression 为输出压缩模式（见 lab.COMPRESSION）；
+    catalog=False 时不生成目录页；deterministic=True 时相同输入总是得到相同字节。
+    pdf_cache_dir 为转换缓存目录（见 main.ConversionCache），命中时记录 cached=True。
+    chapter_cache_dir 为章节缓存目录（见 main.ChapterCache），记录本次的章节命中情况 chapter_cache。
+    """
+    start = time.perf_counter()
+    record = {"source": file_path, "output": output}
+    try:
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        pdf_cache     = main.ConversionCache(pdf_cache_dir) if pdf_cache_dir else None
+        chapter_cache = main.ChapterCache(chapter_cache_dir) if chapter_cache_dir else None
+        report        = lab.Instrument() if instrument else None
+        main.main(file_path, font_normal=font_normal, font_bold=font_bold, output=output, instrument=report,
+                  compression=compression, catalog=catalog, deterministic=deterministic, pdf_cache=pdf_cache,
+                  chapter_cache=chapter_cache)
+        record["status"] = "ok"
+        record["bytes"]  = os.path.getsize(output)
+        if pdf_cache is not None:
+            record["cached"] = pdf_cache.hits > 0
+        if chapter_cache is not None and chapter_cache.last_build is not None:
+            record["chapter_cache"] = chapter_cache.last_build
+        if report is not None:
+            record["report"] = report.report()
+    except Exception as e:
+        record["status"] = "error"
+        record["error"]  = "%s: %s" % (type(e).__name__, e)
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def run(jobs, workers=None, font_normal=main.FONT_NORMAL, font_bold=main.FONT_BOLD, instrument=False,
+        compression=None, snapshot_dir=None, catalog=True, deterministic=False, pdf_cache_dir=None,
+        chapter_cache_dir=None):
+    """
+    用进程池并行转换，按提交顺序返回每个文件的结果记录。
+    只有一个进程可用（或只有一个文件）时直接在当前进程中转换，省去启动进程池的开销。
+    """
+    font_normal = os.path.abspath(font_normal)
+    font_bold   = os.path.abspath(font_bold)
+    workers     = min(workers or os.cpu_count(), max(1, len(jobs)))
+
+    if workers == 1:
+        warm_fonts(font_normal, font_bold, snapshot_dir, bool(pdf_cache_dir))
+        return [convert(file_path, output, font_normal, font_bold, instrument, compression, catalog,
+                        deterministic, pdf_cache_dir, chapter_cache_dir)
+                for file_path, output in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_fonts,
+                             initargs=(font_normal, font_bold, snapshot_dir, bool(pdf_cache_dir))) as pool:
+        futures = [pool.submit(convert, file_path, output, font_normal, font_bold, instrument, compression,
+                               catalog, deterministic, pdf_cache_dir, chapter_cache_dir)
+                   for file_path, output in jobs]
+        return [future.result() for future in futures]
+
+
+def format_bytes(n):
+    """以 KB / MB 显示字节数"""
+    if n >= 1024 * 1024:
+        return "%.1f MB" % (n / 1024 / 1024)
+    return "%.1f KB" % (n / 1024)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="将 txt 笔记批量转换为 pdf")
+    parser.add_argument("paths", nargs="+", help="txt 文件或包含 txt 文件的目录")
+    parser.add_argument("-o", "--output-dir", help="输出目录（默认与源文件放在一起）")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="并行进程数")
+    parser.add_argument("--summary", help="将每个文件的结果与耗时写入该 JSON 文件")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("--instrument", action="store_true", help="在 --summary 中附带每个文件的分阶段计时与计数")
+    parser.add_argument("--compression", choices=sorted(lab.COMPRESSION), help="输出压缩模式（默认沿用 reportlab 的设置）")
+    parser.add_argument("--font-snapshot", help="字体快照目录：首次运行时保存解析好的字体，之后直接加载快照")
+    parser.add_argument("--no-catalog", action="store_true", help="不生成目录页（仍带有文档大纲）")
+    parser.add_argument("--deterministic", action="store_true", help="确定性输出：相同输入总是得到相同字节")
+    parser.add_argument("--pdf-cache", help="转换缓存目录：输入与选项都未改变的文件直接复制上次生成的 pdf")
+    parser.add_argument("--chapter-cache", help="章节缓存目录：重新转换改动过的文件时，未改动的章节直接写入上次渲染的内容")
+    parser.add_argument("--bundle", metavar="PDF", help="将所有文件合并为该 pdf（每个文件为一节，字体只嵌入一次）")
+    return parser.parse_args(argv)
+
+
+def bundle_cli(args, jobs):
+    """--bundle：所有源文件合并为一个 pdf"""
+    start = time.perf_counter()
+    warm_fonts(os.path.abspath(args.font), os.path.abspath(args.bold_font), args.font_snapshot)
+    output = main.main_bundle([source for source, _ in jobs], args.bundle, args.font, args.bold_font,
+                              compression=args.compression, catalog=not args.no_catalog,
+                              deterministic=args.deterministic)
+    elapsed = time.perf_counter() - start
+    size    = os.path.getsize(output)
+    print("共 %s 个文件合并为 %s，用时 %.3fs，输出 %s" % (len(jobs), output, elapsed, format_bytes(size)))
+
+    if args.summary:
+        summary = {
+            "files":   len(jobs),
+            "bundle":  output,
+            "seconds": round(elapsed, 4),
+            "bytes":   size,
+            "sources": [source for source, _ in jobs],
+        }
+        with open(args.summary, "w", encoding="utf-8") as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+def cli(argv=None):
+    args = parse_args(argv)
+    jobs = collect_jobs(args.paths, args.output_dir)
+    if args.bundle:
+        return bundle_cli(args, jobs)
+
+    start   = time.perf_counter()
+    records = run(jobs, args.jobs, args.font, args.bold_font, args.instrument, args.compression,
+                  args.font_snapshot, not args.no_catalog, args.deterministic, args.pdf_cache,
+                  args.chapter_cache)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in records if r["status"] != "ok"]
+    for record in records:
+        if record["status"] == "ok":
+            note = "  (缓存)" if record.get("cached") else ""
+            if "chapter_cache" in record:
+                note += "  (章节缓存命中率 %.0f%%)" % (record["chapter_cache"]["hit_rate"] * 100)
+            print("%8.3fs  %10s  %s%s" % (record["seconds"], format_bytes(record["bytes"]), record["output"], note))
+        else:
+            print("   失败   %s  %s" % (record["source"], record["error"]))
+    total_bytes = sum(r["bytes"] for r in records if r["status"] == "ok")
+    print("共 %s 个文件，失败 %s 个，用时 %.3fs，输出 %s" % (len(records), len(failed), elapsed,
+                                                         format_bytes(total_bytes)))
+
+    if args.summary:
+        summary = {
+            "files":   len(records),
+            "failed":  len(failed),
+            "seconds": round(elapsed, 4),
+            "bytes":   total_bytes,
+            "jobs":    records,
+        }
+        with open(args.summary, "w", encoding="utf-8") as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,15 @@
+"""
+性能基准。
+
+    python -m bench.generate 输出.txt --lines 100000 --seed 1      # 生成测试文档
+    python -m bench.run --lines 100000 -o 结果.json                 # 分阶段计时
+    python -m bench.run --lines 100000 --baseline 基准.json         # 与保存的基准比较
+    python -m bench.run --lines 1000000 --parse-only                # 只测解析：Tree 与流式解析的耗时与内存峰值
+    python -m bench.streams --lines 20000                           # 每页内容流字节数与操作符数
+    python -m bench.startup                                         # 新进程中的导入与单文件转换耗时
+    python -m bench.soak --iterations 20 --threshold 64             # 重复转换的内存泄漏检查（超出阈值时退出码为 1）
+    python -m bench.scaling --max-chars 1000000                     # 超长段落分行耗时是否随长度线性增长
+    python -m bench.memory --max-mb 32 --threshold 1                # 低内存模式的峰值内存是否随输入大小增长
+
+需在 src 目录下运行（或将 src 加入 PYTHONPATH），并准备好字体文件。
+"""
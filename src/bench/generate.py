@@ -0,0 +1,85 @@
+"""按给定参数生成符合笔记格式（制表符缩进、以“：”声明对象）的测试文档。"""
+
+import random
+import argparse
+
+
+CJK   = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理"
+LATIN = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do",
+         "eiusmod", "tempor", "incididunt", "ut", "labore", "et", "dolore", "magna", "aliqua", "2024",
+         "x=1;", "return", "None", "[INFO]", "path/to/file.txt"]
+
+
+def make_paragraph(r, length, cjk, tabs):
+    """生成一行正文：约 length 个字符，cjk 为中文字符占比，tabs 为每个词后出现制表符的概率"""
+    pieces = []
+    total  = 0
+    target = max(1, int(length * r.uniform(0.5, 1.5)))
+    while total < target:
+        if r.random() < cjk:
+            word = "".join(r.choice(CJK) for _ in range(r.randint(1, 6)))
+        else:
+            word = r.choice(LATIN)
+        if pieces:
+            word = ("\t" if r.random() < tabs else " ") + word                  # 行首不放制表符，以免改变缩进
+        pieces.append(word)
+        total += len(word)
+    return "".join(pieces)
+
+
+def generate(seed=1, lines=10000, depth=3, cjk=0.5, tabs=0.02, paragraph=60, headings=None):
+    """
+    生成测试文档文本。
+    lines      正文行数（近似）
+    depth      对象最大嵌套深度
+    cjk        中文字符占比
+    tabs       制表符密度
+    paragraph  平均每行正文的字符数
+    headings   对象（标题）总数，默认约每 10 行正文一个
+    """
+    r = random.Random(seed)
+    if headings is None:
+        headings = max(1, lines // 10)
+
+    # 对象层级序列：下一个对象最多深一级；不再有子对象的对象必须带正文，才能结束声明
+    levels = [1]
+    for _ in range(headings - 1):
+        levels.append(r.randint(1, min(levels[-1] + 1, depth)))
+    leaves = [n for n in range(len(levels))
+              if n == len(levels) - 1 or levels[n + 1] <= levels[n]]
+    per_leaf = max(1, lines // len(leaves))
+
+    out      = []
+    leaf_set = set(leaves)
+    for n, level in enumerate(levels):
+        indent = "\t" * (level - 1)
+        out.append("%s标题%s：" % (indent, n))
+        if n in leaf_set:
+            for _ in range(max(1, int(per_leaf * r.uniform(0.5, 1.5)))):
+                out.append(indent + "\t" + make_paragraph(r, paragraph, cjk, tabs))
+            out.append("")
+    out.append("")
+    return "\n".join(out)
+
+
+def add_arguments(parser):
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--lines", type=int, default=10000, help="正文行数（近似）")
+    parser.add_argument("--depth", type=int, default=3, help="最大嵌套深度")
+    parser.add_argument("--cjk", type=float, default=0.5, help="中文字符占比")
+    parser.add_argument("--tabs", type=float, default=0.02, help="制表符密度")
+    parser.add_argument("--paragraph", type=int, default=60, help="平均每行正文字符数")
+    parser.add_argument("--headings", type=int, default=None, help="标题总数")
+
+
+def generate_from_args(args):
+    return generate(args.seed, args.lines, args.depth, args.cjk, args.tabs, args.paragraph, args.headings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成测试用的笔记文档")
+    parser.add_argument("output", help="输出的 txt 文件")
+    add_arguments(parser)
+    args = parser.parse_args()
+    with open(args.output, "w", encoding="utf-8") as file:
+        file.write(generate_from_args(args))
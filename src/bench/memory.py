@@ -0,0 +1,132 @@
+"""
+低内存模式的规模测试：对逐级翻倍的输入（默认最大 32 MB）各启动一个新进程做流式转换（main(stream=True)），
+记录进程的峰值常驻内存，检查峰值内存随输入大小的增长不超过阈值。
+
+    python -m bench.memory --max-mb 32 --threshold 0.1
+    python -m bench.memory --max-mb 500 --steps 2                   # 250 MB 与 500 MB 输入（单核约需半小时）
+
+输入大小从 max_mb / 2 ** (steps - 1) 起逐级翻倍；标题数固定（--headings），
+因为目录与大纲所需的标题表本来就随标题数增长。以最小二乘拟合每 MB 输入增加的峰值内存，
+超过 --threshold（MB）时以退出码 1 结束。页面内容流与页面对象留在内存中时约为 3–4 MB；
+暂存到磁盘（lab.PageSpool）后每页只保留几个对象偏移，增长接近 0（剩余部分主要是新出现的字符使字体子集变大）。
+需要 resource 模块（Linux / macOS）。
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rlab_stage_2 as lab
+import rlab_stage_3 as main
+from bench import generate
+
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB  = 1024 * 1024
+
+SCRIPT = """
+import os, sys, json, time, resource
+sys.path.insert(0, SRC)
+import rlab_stage_3 as main
+start = time.perf_counter()
+path  = main.main(SOURCE, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, output=OUTPUT, stream=True,
+                  compression=COMPRESSION)
+peak  = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": time.perf_counter() - start, "bytes": os.path.getsize(path),
+                  "peak_rss": peak if sys.platform == "darwin" else peak * 1024}))
+"""
+
+
+def write_document(path, size, headings=10, seed=1):
+    """流式写出约 size 字节、含 headings 个一级标题的测试文档（不在内存中生成整篇文本）"""
+    r = random.Random(seed)
+    per_heading = size // headings
+    with open(path, "w", encoding="utf-8") as file:
+        for n in range(headings):
+            file.write("标题%s：\n" % n)
+            written = 0
+            while written < per_heading:
+                block    = "".join("\t" + generate.make_paragraph(r, 60, 0.5, 0.02) + "\n" for _ in range(100))
+                written += len(block.encode("utf-8"))
+                file.write(block)
+            file.write("\n")
+    return os.path.getsize(path)
+
+
+def measure(source, output, font_normal, font_bold, compression=None):
+    """在新进程中流式转换 source，返回 {"seconds", "bytes", "peak_rss"}"""
+    params = {"SRC": SRC, "SOURCE": source, "OUTPUT": output, "FONT_NORMAL": font_normal,
+              "FONT_BOLD": font_bold, "COMPRESSION": compression}
+    code   = "".join("%s = %r\n" % item for item in params.items()) + SCRIPT
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def fit(rows):
+    """峰值内存对输入大小的最小二乘斜率（每 MB 输入增加的 MB 数）"""
+    if len(rows) < 2:
+        return 0.0
+    xs = [row["input_bytes"] / MB for row in rows]
+    ys = [row["peak_rss"] / MB for row in rows]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    den = sum((x - mean_x) ** 2 for x in xs)
+    return num / den
+
+
+def scaling(max_mb=32, steps=4, headings=10, font_normal=main.FONT_NORMAL, font_bold=main.FONT_BOLD,
+            compression=None, seed=1, folder=None):
+    """返回 [{"input_bytes", "seconds", "bytes", "peak_rss"}, ...]（输入从小到大）"""
+    rows = []
+    with tempfile.TemporaryDirectory(dir=folder) as folder:
+        source = os.path.join(folder, "memory.txt")
+        output = os.path.join(folder, "memory.pdf")
+        for step in range(steps - 1, -1, -1):
+            size = write_document(source, int(max_mb * MB) >> step, headings, seed)
+            row  = measure(source, output, font_normal, font_bold, compression)
+            row["input_bytes"] = size
+            rows.append(row)
+    return rows
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="低内存模式的峰值内存规模测试")
+    parser.add_argument("--max-mb", type=float, default=32, help="最大输入的大小（MB）")
+    parser.add_argument("--steps", type=int, default=4, help="测量的大小级数（逐级翻倍）")
+    parser.add_argument("--headings", type=int, default=10, help="文档中的标题数（固定，不随输入大小变化）")
+    parser.add_argument("--threshold", type=float, default=0.1, help="允许的每 MB 输入峰值内存增量（MB）")
+    parser.add_argument("--compression", choices=sorted(lab.COMPRESSION), help="输出压缩模式")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--tmp", help="存放生成文档与输出的目录（默认为系统临时目录）")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("-o", "--output", help="将结果写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    rows = scaling(args.max_mb, args.steps, args.headings, os.path.abspath(args.font),
+                   os.path.abspath(args.bold_font), args.compression, args.seed, args.tmp)
+    for row in rows:
+        print("输入 %8.1f MB  %8.1fs  输出 %8.1f MB  峰值内存 %7.1f MB" % (
+            row["input_bytes"] / MB, row["seconds"], row["bytes"] / MB, row["peak_rss"] / MB))
+    growth = fit(rows)
+    print("每 MB 输入增加峰值内存 %.2f MB" % growth)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"rows": rows, "mb_per_input_mb": growth}, file, ensure_ascii=False, indent=2)
+
+    if growth > args.threshold:
+        print("失败：峰值内存随输入增长 %.2f MB/MB（阈值 %.2f）" % (growth, args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
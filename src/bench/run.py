@@ -0,0 +1,189 @@
+"""
+分阶段计时：解析、树构建、制表符冻结、分行、目录、端到端转换。
+另以 tracemalloc 测量各种解析方式的内存峰值（建 Tree、流式解析、保存扁平化条目）。
+结果以 JSON 输出，可与保存的基准结果比较，超出容差的阶段视为性能回退。
+--parse-only 只测解析阶段，用于百万行级别的大文档。
+"""
+
+import io
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rlab_stage_2 as lab
+import rlab_stage_3 as main
+from bench import generate
+
+
+def best_of(repeat, func):
+    """重复执行 repeat 次，返回 (最短耗时, 最后一次的返回值)"""
+    best   = None
+    result = None
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = func()
+        spent  = time.perf_counter() - start
+        best   = spent if best is None else min(best, spent)
+    return best, result
+
+
+def peak_memory(func):
+    """在 tracemalloc 下执行一次 func，返回执行期间新分配内存的峰值字节数"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        peak   = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def parse_memory(text):
+    """
+    各种解析方式的内存峰值（字节）：
+        get_tree      建 Tree（嵌套字典）
+        iter_events   流式解析，逐个消费事件而不保存（流式转换的用法）
+        pdf_content   保存扁平化的 (类型, 文本) 条目列表（普通转换的用法）
+    文档文本与行列表在测量前已在内存中，不计入峰值。
+    """
+    lines  = io.StringIO(text).readlines()
+    memory = {}
+    memory["get_tree"] = peak_memory(lambda: main.get_tree(lines))
+    buffer = io.StringIO(text)
+    memory["iter_events"] = peak_memory(lambda: sum(1 for _ in main.iter_events(buffer)))
+    buffer.seek(0)
+    memory["pdf_content"] = peak_memory(lambda: list(main.iter_pdf_content(main.iter_events(buffer))))
+    return memory
+
+
+def run_parse_stages(text, repeat=3):
+    """只对解析相关的阶段计时，返回 {阶段: 秒}"""
+    stages = {}
+    lines  = io.StringIO(text).readlines()
+    stages["get_tree"], tree = best_of(repeat, lambda: main.get_tree(lines))
+    stages["decode_tree_to_pdf"], _ = best_of(repeat, lambda: main.decode_tree_to_pdf(tree.data, result=[]))
+    stages["iter_events"], _ = best_of(repeat, lambda: list(main.iter_pdf_content(main.iter_events(io.StringIO(text)))))
+    return stages
+
+
+def run_stages(text, font_normal, font_bold, repeat=3):
+    """对一篇文档逐阶段计时，返回 {阶段: 秒}"""
+    lines   = io.StringIO(text).readlines()
+    content = list(main.iter_pdf_content(main.iter_events(io.StringIO(text))))
+    texts   = [item[1] for item in content if item[0] == "content"]
+
+    stages = run_parse_stages(text, repeat)
+    stages["freeze_tab"], _ = best_of(repeat, lambda: [lab.freeze_tab(t) for t in texts])
+
+    probe = lab.PDF("bench.txt", font_normal, font_bold, measure=True)
+    stages["split_contents"], _ = best_of(repeat, lambda: probe.split_contents(texts, vectorize=False))
+    if lab.load_numpy() is not None:
+        stages["split_contents_numpy"], _ = best_of(repeat, lambda: probe.split_contents(texts))
+    stages["layout"], (heading_table, catalog_pages, _) = best_of(
+        repeat, lambda: main.layout("bench.txt", content, font_normal=font_normal, font_bold=font_bold))
+
+    with tempfile.TemporaryDirectory() as folder:
+        def catalog():
+            pdf = lab.PDF(os.path.join(folder, "catalog.txt"), font_normal, font_bold)
+            pdf.write_doctitle()
+            pdf.write_catalog(heading_table, catalog_pages)
+            return pdf
+        stages["write_catalog"], _ = best_of(repeat, catalog)
+
+        source = os.path.join(folder, "bench.txt")
+        with open(source, "w", encoding="utf-8") as file:
+            file.write(text)
+        stages["main"], output = best_of(
+            repeat, lambda: main.main(source, font_normal=font_normal, font_bold=font_bold))
+        output_bytes = os.path.getsize(output)
+
+    info = {
+        "chars":         len(text),
+        "lines":         len(lines),
+        "items":         len(content),
+        "headings":      len(heading_table),
+        "catalog_pages": catalog_pages,
+        "output_bytes":  output_bytes,
+    }
+    return stages, info
+
+
+def compare(result, baseline, tolerance):
+    """返回比基准慢出 tolerance 比例以上的阶段 [(阶段, 基准秒, 当前秒), ...]"""
+    regressions = []
+    for stage, seconds in result["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base and seconds > base * (1 + tolerance):
+            regressions.append((stage, base, seconds))
+    return regressions
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="分阶段性能基准")
+    generate.add_arguments(parser)
+    parser.add_argument("--input", help="使用现有的 txt 文档，而不是生成")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数（取最短）")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("-o", "--output", help="将结果写入该 JSON 文件")
+    parser.add_argument("--baseline", help="与该 JSON 基准结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许比基准慢的比例")
+    parser.add_argument("--parse-only", action="store_true", help="只测解析阶段（计时与内存峰值），不排版渲染")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        with open(args.input, encoding="utf-8-sig") as file:
+            text = file.read()
+        params = {"input": args.input}
+    else:
+        text   = generate.generate_from_args(args)
+        params = {k: getattr(args, k) for k in ("seed", "lines", "depth", "cjk", "tabs", "paragraph", "headings")}
+
+    if args.parse_only:
+        stages = run_parse_stages(text, args.repeat)
+        info   = {"chars": len(text), "lines": text.count("\n") + 1}
+    else:
+        stages, info = run_stages(text, os.path.abspath(args.font), os.path.abspath(args.bold_font), args.repeat)
+    memory = parse_memory(text)
+    result = {
+        "params":   params,
+        "document": info,
+        "stages":   stages,
+        "memory":   memory,
+        "python":   platform.python_version(),
+        "numpy":    lab.load_numpy() is not None,
+    }
+
+    for stage, seconds in stages.items():
+        print("%-26s %10.4fs" % (stage, seconds))
+    for stage, peak in memory.items():
+        print("%-26s %10.1f KB（内存峰值）" % (stage, peak / 1024))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("params") != params:
+            print("警告：基准使用的文档参数不同，比较结果仅供参考")
+        regressions = compare(result, baseline, args.tolerance)
+        for stage, base, seconds in regressions:
+            print("回退：%s %.4fs -> %.4fs（%+.0f%%）" % (stage, base, seconds, (seconds / base - 1) * 100))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,89 @@
+"""
+分行的规模测试：对不含换行的超长段落（默认最大 1 MB）计时 split_tabbed_lines，
+检查耗时随段落长度线性增长。
+
+    python -m bench.scaling --max-chars 1000000 --threshold 3
+
+段落长度从 max_chars / 8 起逐级翻倍，分别测量含制表符与不含制表符的段落，
+输出每个长度的耗时与每字符耗时。最长段落的每字符耗时超过最短段落的 --threshold 倍时
+视为非线性增长，以退出码 1 结束。
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rlab_stage_2 as lab
+from bench import generate
+from bench.run import best_of
+
+
+SIZE          = 12                                                              # 正文字号
+CONTENT_WIDTH = 500                                                             # 正文宽度（与页面正文区域相近）
+
+
+def make_text(chars, tabs, seed=1):
+    """生成 chars 个字符、不含换行的段落"""
+    return generate.make_paragraph(random.Random(seed), chars * 2, 0.5, tabs)[:chars]   # 生成的长度在 0.5 ~ 1.5 倍之间浮动
+
+
+def scaling(max_chars=1000000, steps=4, repeat=3, seed=1):
+    """返回 {"tabbed"/"plain": [{"chars", "seconds", "lines", "ns_per_char"}, ...]}"""
+    result = {}
+    for name, tabs in (("tabbed", 0.05), ("plain", 0.0)):
+        text = make_text(max_chars, tabs, seed)
+        rows = []
+        for step in range(steps - 1, -1, -1):
+            part = text[:max_chars >> step]
+            seconds, lines = best_of(repeat, lambda: lab.split_tabbed_lines(part, SIZE, CONTENT_WIDTH))
+            rows.append({
+                "chars":       len(part),
+                "seconds":     seconds,
+                "lines":       len(lines),
+                "ns_per_char": seconds / len(part) * 1e9,
+            })
+        result[name] = rows
+    return result
+
+
+def growth(rows):
+    """最长段落与最短段落的每字符耗时之比（线性增长时接近 1）"""
+    return rows[-1]["ns_per_char"] / rows[0]["ns_per_char"]
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="超长段落分行的规模测试")
+    parser.add_argument("--max-chars", type=int, default=1000000, help="最长段落的字符数")
+    parser.add_argument("--steps", type=int, default=4, help="测量的长度级数（逐级翻倍）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个长度重复次数（取最短）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--threshold", type=float, default=3.0, help="允许的每字符耗时增长倍数（平方级增长约为 2 ** (steps - 1)）")
+    parser.add_argument("-o", "--output", help="将结果写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    result   = scaling(args.max_chars, args.steps, args.repeat, args.seed)
+    failures = []
+    for name, rows in result.items():
+        for row in rows:
+            print("%-7s %9d 字符  %8.4fs  %7d 行  %6.1f ns/字符" % (
+                name, row["chars"], row["seconds"], row["lines"], row["ns_per_char"]))
+        ratio = growth(rows)
+        print("%-7s 每字符耗时增长 %.2f 倍" % (name, ratio))
+        if ratio > args.threshold:
+            failures.append(name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+
+    for name in failures:
+        print("失败：%s 段落的分行耗时随长度非线性增长" % name)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
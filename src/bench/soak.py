@@ -0,0 +1,174 @@
+"""
+内存浸泡测试：在同一个进程中反复调用 main()（与图形界面常驻进程的用法相同），
+用 tracemalloc 与进程 RSS 测量每次转换后仍被保留的内存。
+
+    python -m bench.soak --iterations 20 --threshold 64
+
+预热若干次后开始记录，以最小二乘拟合每次转换的内存增量；超过 --threshold（KB）
+或转换结束后仍有存活的画布、PDF 对象与字体子集状态时以退出码 1 结束，可直接作为 CI 中的检查。
+同时按源代码行列出增长最多的分配位置，便于定位泄漏。
+"""
+
+import os
+import gc
+import sys
+import json
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rlab_stage_2 as lab
+import rlab_stage_3 as main
+from bench import generate
+
+
+WATCHED_TYPES = ("Canvas", "PDFDocument", "PDF", "TextLayer", "PageCompressor", "PageSpool")   # 转换结束后不应存活的对象
+
+
+def rss_bytes():
+    """当前进程的常驻内存字节数（不支持 /proc 的平台返回 None）"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def live_objects():
+    """统计仍存活的画布、文档与 PDF 对象，以及字体缓存中残留的文档子集状态"""
+    counts = dict.fromkeys(WATCHED_TYPES, 0)
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in counts:
+            counts[name] += 1
+    counts["font_states"] = sum(len(font.state) for font in lab.font_cache.fonts.values())
+    return counts
+
+
+def slope(values):
+    """最小二乘拟合的每次增量"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    num = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    den = sum((x - mean_x) ** 2 for x in range(n))
+    return num / den
+
+
+def soak(sources, iterations=20, warmup=3, font_normal=main.FONT_NORMAL, font_bold=main.FONT_BOLD,
+         output_dir=None, top=10, **options):
+    """
+    依次循环转换 sources 共 warmup + iterations 次，返回测量结果。
+    options 原样传给 main.main（如 stream、compression）。
+    output_dir 为 None 时输出写入临时目录，结束后删除。
+    """
+    folder = nullcontext(output_dir) if output_dir else tempfile.TemporaryDirectory(prefix="soak-")
+    with folder as output_dir:
+        def convert(n):
+            source = sources[n % len(sources)]
+            output = os.path.join(output_dir, "%s.pdf" % (n % len(sources)))
+            main.main(source, font_normal=font_normal, font_bold=font_bold, output=output, **options)
+
+        for n in range(warmup):
+            convert(n)
+        gc.collect()
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        traced = []
+        rss    = []
+        for n in range(iterations):
+            convert(warmup + n)
+            gc.collect()
+            traced.append(tracemalloc.get_traced_memory()[0])
+            rss.append(rss_bytes())
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    growth  = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return {
+        "iterations":          iterations,
+        "traced_per_iter":     slope(traced),
+        "rss_per_iter":        slope(rss) if None not in rss else None,
+        "traced_first":        traced[0],
+        "traced_last":         traced[-1],
+        "rss_last":            rss[-1],
+        "live_objects":        live_objects(),
+        "top_growth": [
+            {
+                "line":  str(stat.traceback[0]),
+                "bytes": stat.size_diff,
+                "count": stat.count_diff,
+            }
+            for stat in growth[:top] if stat.size_diff > 0
+        ],
+    }
+
+
+def check(result, threshold):
+    """返回不满足要求的项目列表（为空表示通过）"""
+    problems = []
+    if result["traced_per_iter"] > threshold:
+        problems.append("每次转换保留 %.1f KB（阈值 %.1f KB）" % (result["traced_per_iter"] / 1024, threshold / 1024))
+    for name, count in result["live_objects"].items():
+        if count:
+            problems.append("转换结束后仍有 %s 个 %s" % (count, name))
+    return problems
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="重复转换的内存浸泡测试")
+    generate.add_arguments(parser)
+    parser.set_defaults(lines=100)
+    parser.add_argument("--input", action="append", help="使用现有的 txt 文档（可重复），而不是生成")
+    parser.add_argument("--inputs", type=int, default=3, help="生成的文档数（各次转换轮流使用）")
+    parser.add_argument("--iterations", type=int, default=20, help="记录的转换次数")
+    parser.add_argument("--warmup", type=int, default=3, help="开始记录前的预热转换次数")
+    parser.add_argument("--threshold", type=float, default=64, help="允许的每次转换内存增量（KB）")
+    parser.add_argument("--stream", action="store_true", help="使用低内存流式转换")
+    parser.add_argument("--compression", choices=sorted(lab.COMPRESSION), help="输出压缩模式")
+    parser.add_argument("--top", type=int, default=10, help="列出增长最多的分配位置数")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("-o", "--output", help="将结果写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        sources = args.input or []
+        if not sources:
+            seed = args.seed
+            for n in range(args.inputs):
+                args.seed = seed + n
+                sources.append(os.path.join(folder, "soak%s.txt" % n))
+                with open(sources[-1], "w", encoding="utf-8") as file:
+                    file.write(generate.generate_from_args(args))
+        result = soak(sources, args.iterations, args.warmup, os.path.abspath(args.font),
+                      os.path.abspath(args.bold_font), folder, args.top,
+                      stream=args.stream, compression=args.compression)
+
+    print("每次转换保留（tracemalloc）%10.1f KB" % (result["traced_per_iter"] / 1024))
+    if result["rss_per_iter"] is not None:
+        print("每次转换增长（RSS）        %10.1f KB" % (result["rss_per_iter"] / 1024))
+    print("存活对象：%s" % ", ".join("%s=%s" % item for item in result["live_objects"].items()))
+    print("增长最多的分配位置：")
+    for item in result["top_growth"]:
+        print("  %10.1f KB  %6d 个  %s" % (item["bytes"] / 1024, item["count"], item["line"]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+
+    problems = check(result, args.threshold * 1024)
+    for problem in problems:
+        print("失败：" + problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,115 @@
+"""
+冷启动基准：每次测量都启动一个新的 Python 进程，记录整个进程的墙钟时间（取最短）。
+
+    python            空白的 Python 进程（解释器本身的启动时间，作为参照）
+    import            只导入 rlab_stage_3（并检查是否导入了 reportlab / numpy）
+    parse             导入并解析文档，不渲染
+    convert           单个文件的完整转换（batch.run 单进程路径）
+    convert_snapshot  同上，但从字体快照加载字体（快照在计时前预先生成）
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rlab_stage_3 as main
+from bench import generate
+
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = {
+    "python": """
+print(json.dumps({}))
+""",
+    "import": """
+import sys
+import rlab_stage_3
+print(json.dumps({"reportlab": "reportlab" in sys.modules, "numpy": "numpy" in sys.modules}))
+""",
+    "parse": """
+import sys
+import rlab_stage_3 as main
+with open(SOURCE, encoding="utf-8-sig") as file:
+    items = sum(1 for _ in main.iter_pdf_content(main.iter_events(file)))
+print(json.dumps({"items": items, "reportlab": "reportlab" in sys.modules}))
+""",
+    "convert": """
+import batch
+records = batch.run([(SOURCE, OUTPUT)], 1, FONT_NORMAL, FONT_BOLD, snapshot_dir=SNAPSHOT)
+print(json.dumps({"status": records[0]["status"], "bytes": records[0].get("bytes")}))
+""",
+}
+
+
+def run_script(name, params, repeat):
+    """在新进程中运行脚本 repeat 次，返回 (最短墙钟秒数, 最后一次的输出)"""
+    prelude = "import json, sys\nsys.path.insert(0, %r)\n" % SRC
+    prelude += "".join("%s = %r\n" % item for item in params.items())
+    code = prelude + SCRIPTS[name]
+    best, output = None, None
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        spent  = time.perf_counter() - start
+        best   = spent if best is None else min(best, spent)
+        output = json.loads(result.stdout.strip().splitlines()[-1])
+    return best, output
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="冷启动基准")
+    generate.add_arguments(parser)
+    parser.set_defaults(lines=300)
+    parser.add_argument("--input", help="使用现有的 txt 文档，而不是生成")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量重复次数（取最短）")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("-o", "--output", help="将结果写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "bench.txt")
+        if args.input:
+            with open(args.input, encoding="utf-8-sig") as file:
+                text = file.read()
+        else:
+            text = generate.generate_from_args(args)
+        with open(source, "w", encoding="utf-8") as file:
+            file.write(text)
+
+        params = {
+            "SOURCE":      source,
+            "OUTPUT":      os.path.join(folder, "bench.pdf"),
+            "FONT_NORMAL": os.path.abspath(args.font),
+            "FONT_BOLD":   os.path.abspath(args.bold_font),
+            "SNAPSHOT":    None,
+        }
+        result = {}
+        result["python"], _    = run_script("python", params, args.repeat)
+        result["import"], info = run_script("import", params, args.repeat)
+        result["parse"], _     = run_script("parse", params, args.repeat)
+        result["convert"], _   = run_script("convert", params, args.repeat)
+
+        params["SNAPSHOT"] = os.path.join(folder, "fonts")
+        run_script("convert", params, 1)                                        # 生成字体快照
+        result["convert_snapshot"], _ = run_script("convert", params, args.repeat)
+
+    for stage, seconds in result.items():
+        print("%-18s %8.3fs" % (stage, seconds))
+    print("导入 rlab_stage_3 时加载了 reportlab：%s，numpy：%s" % (info["reportlab"], info["numpy"]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"stages": result, "imports": info}, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,90 @@
+"""
+页面内容流统计：每页内容流字节数、操作符数与文本对象数，以及转换耗时与输出文件大小。
+在不同版本上分别运行，即可比较绘制层改动前后内容流的大小。需要可选依赖 pypdf。
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pypdf                                                                # 可选依赖：解析输出的 pdf
+    from pypdf.generic import ContentStream
+except ImportError:
+    pypdf = None
+
+import rlab_stage_3 as main
+from bench import generate
+from bench.run import best_of
+
+
+def measure_streams(path):
+    """统计 pdf 各页（解压后的）内容流，返回汇总信息"""
+    reader  = pypdf.PdfReader(path)
+    pages   = len(reader.pages)
+    size    = 0
+    ops     = 0
+    objects = 0
+    for page in reader.pages:
+        contents = page.get_contents()
+        if contents is None:
+            continue
+        size       += len(contents.get_data())
+        operations  = ContentStream(contents, reader).operations
+        ops        += len(operations)
+        objects    += sum(1 for _, operator in operations if operator == b"BT")
+    return {
+        "pages":                 pages,
+        "stream_bytes_per_page": size / pages,
+        "ops_per_page":          ops / pages,
+        "text_objects_per_page": objects / pages,
+        "output_bytes":          os.path.getsize(path),
+    }
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="页面内容流统计")
+    generate.add_arguments(parser)
+    parser.add_argument("--input", help="使用现有的 txt 文档，而不是生成")
+    parser.add_argument("--repeat", type=int, default=3, help="转换重复次数（取最短）")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("-o", "--output", help="将结果写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    if pypdf is None:
+        print("需要安装 pypdf")
+        return 1
+
+    if args.input:
+        with open(args.input, encoding="utf-8-sig") as file:
+            text = file.read()
+    else:
+        text = generate.generate_from_args(args)
+
+    font_normal = os.path.abspath(args.font)
+    font_bold   = os.path.abspath(args.bold_font)
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, "bench.txt")
+        with open(source, "w", encoding="utf-8") as file:
+            file.write(text)
+        seconds, output = best_of(
+            args.repeat, lambda: main.main(source, font_normal=font_normal, font_bold=font_bold))
+        result = measure_streams(output)
+    result["main"] = seconds
+
+    for key, value in result.items():
+        print("%-22s %12.2f" % (key, value))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
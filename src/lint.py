@@ -0,0 +1,75 @@
+"""
+只检查不渲染的笔记格式校验，适合提交钩子与 CI。
+
+    python lint.py 笔记目录 其他.txt -j 8
+
+逐行流式读取，一次报告文件中的全部结构错误（格式为“文件:行号: 信息”，行号从 1 开始），
+不构建 Tree，也不导入 reportlab。目录参数会递归查找其中所有 .txt 文件，
+文件较多时由多个进程分别检查。存在错误时以退出码 1 结束；
+嵌套过深等只会丢失内容的问题作为警告报告，加 --strict 时同样视为错误。
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import rlab_stage_3 as main
+import batch
+
+
+def check_file(path):
+    """检查单个文件，返回 {"source", "problems": [[行号, 严重程度, 信息], ...]}（行号从 1 开始）"""
+    problems = []
+    try:
+        with open(path, 'r', encoding='utf-8-sig') as file:
+            for i, severity, message in main.iter_problems(file):
+                problems.append([i + 1, severity, message])
+    except UnicodeDecodeError as e:
+        problems.append([None, "error", "文档编码必须是 UTF-8（%s）" % e.reason])
+    except OSError as e:
+        problems.append([None, "error", "无法读取文件（%s）" % e.strerror])
+    return {"source": path, "problems": problems}
+
+
+def run(paths, workers=None):
+    """检查 paths 中的所有文件，按输入顺序返回各文件的结果"""
+    workers = workers or os.cpu_count()
+    if workers <= 1 or len(paths) <= 1:
+        return [check_file(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(paths) // (workers * 4))                         # 单个文件检查很快，成批分发以减少进程间往返
+        return list(pool.map(check_file, paths, chunksize=chunksize))
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="校验 txt 笔记的格式（不生成 pdf）")
+    parser.add_argument("paths", nargs="+", help="txt 文件或目录")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="并行进程数")
+    parser.add_argument("--strict", action="store_true", help="警告也视为错误")
+    parser.add_argument("--summary", help="将检查结果写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    paths   = [source for source, _ in batch.collect_jobs(args.paths)]
+    records = run(paths, args.jobs)
+
+    failing = ("error", "warning") if args.strict else ("error",)
+    errors  = 0
+    for record in records:
+        for line, severity, message in record["problems"]:
+            location = record["source"] if line is None else "%s:%s" % (record["source"], line)
+            print("%s: %s%s" % (location, "" if severity == "error" else "警告：", message))
+            errors += severity in failing
+    print("共检查 %s 个文件，%s 个问题" % (len(records), sum(len(r["problems"]) for r in records)),
+          file=sys.stderr)
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as file:
+            json.dump({"files": len(records), "errors": errors, "jobs": records}, file, ensure_ascii=False, indent=2)
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
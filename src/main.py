@@ -4,7 +4,7 @@ import win32gui
 import win32ui
 from win32com.shell import shell
 
-import rlab_stage_3 as main
+from service import ConversionService
 
 class MyWindow:
     def __init__(self):
@@ -61,7 +61,33 @@ class MyWindow:
         # 允许窗口接受拖放的文件
         win32gui.DragAcceptFiles(hWnd, True)
 
-        self.file_num = 0
+        # 后台转换队列：拖入文件后立即返回，转换进度通过事件更新到窗口上
+        self.hWnd = hWnd
+        self.service = ConversionService()
+        self.service.subscribe(self.on_progress)
+
+    # 转换进度回调（在后台线程中调用）
+    def on_progress(self, job_id, stage, info):
+        job = self.service.status(job_id)
+        name = job["path"]
+        pending = self.service.pending()
+        if stage == "done":
+            self.text2 = info["file"] + " 生成完毕！  "
+        elif stage == "failed":
+            self.text2 = name + " 转换失败：" + info["error"]
+        elif stage == "cancelled":
+            self.text2 = name + " 已取消"
+        elif stage == "rendering":
+            self.text2 = "%s 正在生成第 %s 页…" % (name, info["page"])
+        else:
+            stages = {"queued": "排队中", "running": "开始转换", "parsed": "解析完成",
+                      "laid_out": "排版完成", "catalog": "目录完成", "saved": "已保存"}
+            self.text2 = name + " " + stages.get(stage, stage)
+        if pending > 1:
+            self.text2 += "（剩余 %s 个）" % (pending - 1)
+
+        # 重绘窗口以显示新文本
+        win32gui.InvalidateRect(self.hWnd, None, True)
         
     # 定义窗口的回调函数，处理绘画和拖放文件消息
     def WindowProcedure(self, hwnd, msg, wParam, lParam):
@@ -112,13 +138,8 @@ class MyWindow:
                 path = shell.DragQueryFile(wParam, i)
                 # print(f"Dropped file: {path}")
 
-                # 调用外部功能
-                new_path = main.main(path, self.file_num)
-                self.text2 = new_path + " 生成完毕！  "
-                self.file_num += 2
-
-                # 重绘窗口以显示新文本
-                win32gui.InvalidateRect(hwnd, None, True)
+                # 提交到后台转换队列，不阻塞消息循环
+                self.service.submit(path)
                 
             win32api.DragFinish(wParam)
             result = 0  # 返回 0 表示消息已处理
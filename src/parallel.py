@@ -0,0 +1,176 @@
+"""
+并行分章渲染：在一级标题处切分文档，由多个进程分别渲染各段章节，最后合并为一个 pdf。
+
+    python parallel.py 笔记.txt -j 8
+
+一级标题总是从新的一页开始，因此先整体排版测量得到每章的页数，即可算出每段的起始页码，
+各段独立渲染时页脚页码已是全局页码。目录链接与每页的“返回目录”链接
+在各段中只记录不创建，合并时再以全局页码添加：目录链接直接跳转到目标页，
+“返回目录”链接与整体渲染时一样经由文档目录 /Dests 中的命名目标（p2）跳转；
+文档大纲同样在合并时按全局标题索引一次性添加。
+合并需要可选依赖 pypdf。
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pypdf                                                                # 可选依赖：合并分段渲染的 pdf
+    from pypdf.annotations import Link
+    from pypdf.generic import Fit, ArrayObject, DictionaryObject, NameObject
+except ImportError:
+    pypdf = None
+
+import rlab_stage_2 as lab
+import rlab_stage_3 as main
+import batch
+
+
+def plan_parts(results, parts):
+    """将各章按页数尽量均匀地分为至多 parts 段连续的章节，返回每段的章节下标范围 [(起, 止), ...]"""
+    total  = sum(result["pages"] for result in results)
+    target = total / max(1, parts)
+    ranges = []
+    start  = 0
+    pages  = 0
+    for n, result in enumerate(results):
+        pages += result["pages"]
+        if pages >= target * (len(ranges) + 1) and len(ranges) < parts - 1:
+            ranges.append((start, n + 1))
+            start = n + 1
+    if start < len(results):
+        ranges.append((start, len(results)))
+    return ranges
+
+
+def render_front(arg, part_path, heading_table, catalog_page_num, font_normal, font_bold, compression=None):
+    """渲染封面与目录，返回 (延后添加的链接, 末页页码, 目录自身的标题行)"""
+    pdf = lab.PDF(arg, font_normal, font_bold, output=part_path, defer_links=True, compression=compression)
+    pdf.write_doctitle()
+    pdf.write_catalog(heading_table, catalog_page_num)
+    pdf.save()
+    return pdf.deferred_links, pdf.page_num, pdf.heading_table.rows()
+
+
+def render_part(arg, part_path, items, content_lines, first_page, font_normal, font_bold, compression=None,
+                catalog=True):
+    """
+    从第 first_page 页开始渲染一段章节，返回 (延后添加的链接, 末页页码)。
+    没有目录页时封面由第一段（first_page 为 1）写出，正文紧接其后。
+    """
+    pdf = lab.PDF(arg, font_normal, font_bold, output=part_path, first_page=first_page, defer_links=True,
+                  compression=compression, catalog=catalog)
+    if catalog:
+        pdf.write_homelink(2)                                                   # 该页在整体渲染时由换页产生，同样带有返回目录链接
+    elif first_page == 1:
+        pdf.write_doctitle()
+    main.write_body(pdf, items, content_lines=content_lines)
+    pdf.save()
+    return pdf.deferred_links, pdf.page_num
+
+
+def merge(part_paths, links, output, heading_table=()):
+    """
+    按顺序合并各段，以全局页码添加各段记录的链接，并按 heading_table（全局页码）添加文档大纲。
+    共用目标的链接与 PDF.bind_destinations 一样经由文档目录 /Dests 中的命名目标 p{页码} 跳转。
+    """
+    writer = pypdf.PdfWriter()
+    for path in part_paths:
+        writer.append(path)
+    dests = DictionaryObject()
+    for page, rect, target, shared in links:
+        link = Link(rect=rect, border=[0, 0, 0], target_page_index=target - 1, fit=Fit.fit())
+        if shared:
+            name = NameObject("/p%s" % target)
+            dests[name] = ArrayObject([writer.pages[target - 1].indirect_reference, NameObject("/Fit")])
+            link[NameObject("/Dest")] = name
+        writer.add_annotation(page - 1, link)
+    if dests:
+        writer.root_object[NameObject("/Dests")] = dests
+    parents = []                                                                # parents[n] 为第 n 层最近的大纲条目
+    for text, level, page, y in heading_table:
+        depth = min(level - 1, len(parents))                                    # 与 PDF.mark_heading 一样不允许跳级
+        del parents[depth:]
+        parent = parents[-1] if parents else None
+        parents.append(writer.add_outline_item(text, page - 1, parent, fit=Fit.xyz(left=0, top=y)))
+    with open(output, "wb") as file:
+        writer.write(file)
+
+
+def convert(arg, workers=None, font_normal=main.FONT_NORMAL, font_bold=main.FONT_BOLD, output=None,
+            compression=None, catalog=True):
+    """并行分章转换 arg 所指的 txt 文档，返回生成的 pdf 文件路径。catalog=False 时不生成目录页"""
+    if pypdf is None:
+        raise ImportError("并行分章渲染需要安装 pypdf")
+
+    workers     = workers or os.cpu_count()
+    font_normal = os.path.abspath(font_normal)
+    font_bold   = os.path.abspath(font_bold)
+    output      = output or lab.cut_extname(arg) + ".pdf"
+
+    with open(arg, 'r', encoding='utf-8-sig') as file:
+        pdf_content = list(main.iter_pdf_content(main.iter_events(file)))
+
+    # 整体排版测量：每章页数与全局标题表
+    chapters = main.split_chapters(pdf_content)
+    results  = main.layout_chapters(arg, chapters, font_normal=font_normal, font_bold=font_bold)
+
+    heading_table = lab.HeadingIndex()
+    first_pages   = []
+    start_page    = 2
+    for result in results:
+        first_pages.append(start_page)
+        heading_table.extend(result["headings"], start_page - 1)
+        start_page += result["pages"]
+    catalog_page_num = main.measure_catalog(arg, heading_table, font_normal, font_bold) if catalog else 0
+
+    ranges = plan_parts(results, workers)
+    folder = os.path.dirname(os.path.abspath(output))
+    with tempfile.TemporaryDirectory(dir=folder) as tmp:
+        paths = [os.path.join(tmp, "%s.pdf" % n) for n in range(len(ranges) + 1)]
+        if not catalog:
+            paths.pop(0)                                                        # 没有目录时不单独渲染封面
+            first_pages[0] = 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=batch.warm_fonts,
+                                 initargs=(font_normal, font_bold)) as pool:
+            futures = []
+            if catalog:
+                futures.append(pool.submit(render_front, arg, paths[0], heading_table, catalog_page_num,
+                                           font_normal, font_bold, compression))
+            for n, (a, b) in enumerate(ranges):
+                items = [item for chapter in chapters[a:b] for item in chapter]
+                lines = [lines for result in results[a:b] for lines in result["content_lines"]]
+                futures.append(pool.submit(render_part, arg, paths[n + int(catalog)], items, lines,
+                                           first_pages[a] + catalog_page_num, font_normal, font_bold,
+                                           compression, catalog))
+            parts = [future.result() for future in futures]
+
+        outline = lab.HeadingIndex.from_rows(parts[0][2] if catalog else [])   # 目录页自身的标题
+        outline.extend(heading_table, catalog_page_num)
+        links = [link for part in parts for link in part[0]]
+        merge(paths, links, output, outline)
+
+    return output
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="并行分章渲染单个大文档")
+    parser.add_argument("path", help="txt 文件")
+    parser.add_argument("-o", "--output", help="输出的 pdf 文件")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="并行进程数")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("--compression", choices=sorted(lab.COMPRESSION), help="输出压缩模式（默认沿用 reportlab 的设置）")
+    parser.add_argument("--no-catalog", action="store_true", help="不生成目录页（仍带有文档大纲）")
+    args = parser.parse_args(argv)
+    output = convert(args.path, args.jobs, args.font, args.bold_font, args.output, args.compression,
+                     not args.no_catalog)
+    print("%s  %s" % (output, batch.format_bytes(os.path.getsize(output))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
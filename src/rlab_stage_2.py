@@ -1,10 +1,38 @@
 import os
-
-from reportlab.lib.pagesizes import letter, A4                                  # 页面尺寸
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.colors import Color
+import re
+import sys
+import json
+import time
+import zlib
+import pickle
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from weakref import WeakKeyDictionary
+from array import array
+
+# reportlab 与 numpy 都在真正需要时才导入（只解析文档、只测量排版时不需要 reportlab），
+# 以缩短命令行单次转换的冷启动时间。
+
+np = None                                                                       # numpy 模块，见 load_numpy
+
+
+HALFWIDTH_RUNS = re.compile("[\x20-\x7e]+")                                     # 连续的半角字符
+COMPRESSION    = {"none": 0, "fast": 1, "max": 9}                               # 输出压缩模式 -> 页面内容流的 zlib 压缩级别
+VECTORIZE_MIN_CHARS = 200000                                                    # 正文总字符数达到该值时才用 NumPy 批量分行
+FONT_SNAPSHOT_VERSION = 1                                                       # 字体快照格式版本
+A4 = (595.2755905511812, 841.8897637795277)                                     # 与 reportlab.lib.pagesizes.A4 相同（只测量时不必导入 reportlab）
+
+
+def load_numpy():
+    """导入 numpy（可选依赖：整篇文档批量分行），未安装时返回 None"""
+    global np
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:
+            np = False
+    return np or None
 
 
 def is_halfwidth(char):
@@ -16,30 +44,93 @@ def is_halfwidth(char):
         return True
     return False
 
-def split_lines_by_pagewidth(text, size, content_width):
+def split_lines_by_pagewidth(text, size, content_width, widths=None):
     """获取按渲染后文字宽度与页面宽度分行后的行列表"""
-    lines = []
-    width = 0
-    index = 0
-    for char in text[:]:
-        if is_halfwidth(char):
-            width += size / 2
-        else:
-            width += size
+    return split_tabbed_lines(text, size, content_width, tab_length=0, widths=widths)
+
+def split_contents(texts, size, content_width, widths, vectorize=True):
+    """
+    整篇文档批量分行，返回与 texts 一一对应的行列表。
+    安装了 NumPy 时一次性将所有字符映射为宽度并求累加和，再用 searchsorted 求出每一行的结束位置；
+    否则（或 vectorize=False、正文总字符数不足 VECTORIZE_MIN_CHARS 时）逐段调用 split_tabbed_lines。
+    两条路径的结果完全一致；小文档导入 NumPy 的耗时比分行本身还长，因此不使用。
+    """
+    if (not vectorize or sum(map(len, texts)) < VECTORIZE_MIN_CHARS
+            or load_numpy() is None):
+        return [split_tabbed_lines(text, size, content_width, widths=widths) for text in texts]
+
+    texts = [freeze_tab(text) for text in texts]
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+
+    # 码位 -> 宽度（千分之一字号），未收录的码位使用默认宽度
+    table  = np.frombuffer(widths.widths, dtype=np.float32)
+    inside = codes < len(table)
+    char_widths = np.full(len(codes), widths.default, dtype=np.float64)
+    char_widths[inside] = table[codes[inside]]
+
+    total = len(codes)
+    cum   = np.zeros(total + 1, dtype=np.float64)
+    np.cumsum(char_widths, out=cum[1:])
+    limit = content_width * 1000 / size
+
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    ends    = np.cumsum(lengths)
+    starts  = ends - lengths                                                    # 每段当前行的起始位置
+
+    # 所有段落同时推进：每一轮为每个尚未分完的段落求出一行的结束位置
+    active    = np.nonzero(lengths)[0]
+    rounds    = []
+    while active.size:
+        s = starts[active]
+        e = ends[active]
+        stop = np.searchsorted(cum, cum[s] + limit, side="right") - 1
+        # 用与逐字累加相同的差值比较修正 searchsorted 的舍入误差
+        while True:
+            grow = (stop < e) & (cum[np.minimum(stop + 1, total)] - cum[s] <= limit)
+            if not grow.any():
+                break
+            stop[grow] += 1
+        while True:
+            shrink = (stop > s) & (cum[np.minimum(stop, total)] - cum[s] > limit)
+            if not shrink.any():
+                break
+            stop[shrink] -= 1
+        stop = np.minimum(np.maximum(stop, s + 1), e)                          # 每行至少一个字符
+
+        rounds.append((active, stop))
+        starts[active] = stop
+        active = active[stop < e]
+
+    # 按段落整理各行的结束位置
+    result = [[text] for text in texts]
+    if rounds:
+        owners = np.concatenate([r[0] for r in rounds])
+        stops  = np.concatenate([r[1] for r in rounds])
+        order  = np.lexsort((stops, owners))
+        owners = owners[order].tolist()
+        stops  = stops[order].tolist()
+
+        i = 0
+        while i < len(owners):
+            owner = owners[i]
+            text  = texts[owner]
+            base  = int(ends[owner]) - len(text)
+            lines = []
+            start = 0
+            while i < len(owners) and owners[i] == owner:
+                stop = stops[i] - base
+                lines.append(text[start:stop])
+                start = stop
+                i += 1
+            result[owner] = lines
+
+    return result
+
+def get_textwidth(text, size, widths=None):
+    """获取字符串渲染后的宽度。传入字形宽度表 widths 时按真实字形宽度计算，否则按中英文2:1估算。"""
+    if widths is not None:
+        return widths.text_width(text, size)
 
-        if width > content_width:
-            width = size / 2 if is_halfwidth(char) else size
-            lines.append(text[:index])
-            text = text[index:]
-            index = 1
-                
-        index += 1
-        
-    lines.append(text)
-    return lines
-
-def get_textwidth(text, size):
-    """获取字符串渲染后的宽度"""
     width = 0
     for char in text:
         if is_halfwidth(char):
@@ -78,20 +169,87 @@ def get_visualindex(text, index):
             
     return vindex
 
-def freeze_tab(text):
+def get_visualwidth(text):
+    """获得字符串的视觉宽度。（按照中英文2:1等宽字体）"""
+    return len(text) + len(HALFWIDTH_RUNS.sub("", text))                       # 非半角字符按2计
+
+def freeze_tab(text, tab_length=8):
     """冻结渲染前文本中的制表符为视觉等长的空格。（按照中英文2:1等宽字体）"""
-    tab_length = 8
-    offset     = 0
-    new_text   = text
-    for i in range(len(text)):
-        if text[i] == "\t":
-            vindex = get_visualindex(new_text, i+offset)                        # 该制表符前面的文本的视觉宽度
-            mod = vindex % tab_length
-            new_text = remove_char(new_text, i+offset)                          # 移除该匹配到的制表符
-            new_text = insert_string(new_text, i+offset, " " * (8-mod))         # 插入与该制表符视觉宽度等宽的若干空格
-            offset  += 8 - mod - 1                                              # 校正插入空格可能导致的索引偏移
-
-    return new_text
+    if "\t" not in text:
+        return text
+
+    parts  = text.split("\t")
+    pieces = [parts[0]]
+    vindex = get_visualwidth(parts[0])                                          # 当前视觉索引
+    for part in parts[1:]:
+        n = tab_length - vindex % tab_length                                    # 与该制表符视觉宽度等宽的空格数
+        pieces.append(" " * n)
+        pieces.append(part)
+        vindex += n + get_visualwidth(part)
+
+    return "".join(pieces)
+
+def split_tabbed_lines(text, size, content_width, tab_length=8, widths=None):
+    """
+    单遍完成制表符冻结与按页面宽度分行，等价于 split_lines_by_pagewidth(freeze_tab(text), ...)。
+    tab_length=0 时不展开制表符。
+    制表符始终按中英文2:1的视觉宽度展开；传入字形宽度表 widths 时按真实字形宽度分行，否则按2:1估算。
+    """
+    if widths is not None:
+        # 先展开制表符（只有含制表符的段落才需要计算视觉索引），之后每个字符只查一次宽度表。
+        # 按宽度表原始单位（千分之一字号）累加，与 split_contents 的 NumPy 路径逐位一致
+        if tab_length:
+            text = freeze_tab(text, tab_length)
+        table   = widths.widths
+        count   = len(table)
+        default = widths.default
+        limit   = content_width * 1000 / size
+        cuts    = [0]
+        width   = 0
+        for pos, char in enumerate(text):
+            code = ord(char)
+            w = table[code] if code < count else default
+            width += w
+            if width > limit and pos > cuts[-1]:                                # 超出页宽的字符移到下一行（每行至少一个字符）
+                cuts.append(pos)
+                width = w
+        ends = cuts[1:] + [len(text)]
+        return [text[a:b] for a, b in zip(cuts, ends)]
+
+    half   = size / 2
+    limit  = content_width
+    pieces = []                                                                 # 展开制表符后的文本片段
+    cuts   = [0]                                                                # 各行在展开后文本中的起始位置
+    vindex = 0                                                                  # 当前视觉索引（用于展开制表符）
+    width  = 0                                                                  # 当前行已占用的宽度
+    pos    = 0                                                                  # 当前字符在展开后文本中的位置
+
+    for char in text:
+        if char == "\t" and tab_length:
+            n = tab_length - vindex % tab_length
+            chars = " " * n
+        else:
+            chars = char
+        pieces.append(chars)
+
+        for c in chars:
+            if is_halfwidth(c):
+                w = half
+                vindex += 1
+            else:
+                w = size
+                vindex += 2
+
+            width += w
+            if width > limit and pos > cuts[-1]:                        # 超出页宽的字符移到下一行（每行至少一个字符）
+                cuts.append(pos)
+                width = w
+
+            pos += 1
+
+    new_text = "".join(pieces)
+    ends = cuts[1:] + [len(new_text)]
+    return [new_text[a:b] for a, b in zip(cuts, ends)]
 
 def get_barefilename(file_path):
     """根据文件路径获得不带拓展名的文件名。"""
@@ -112,20 +270,739 @@ def cut_extname(file_path):
     else:
         # 如果没有找到点号，返回整个字符串
         return file_path
+
+
+
+def object_bytes(obj, skip=("state",)):
+    """
+    对象及其引用的全部容器与属性占用的内存字节数（按 sys.getsizeof 逐个累加，共享的对象只计一次）。
+    skip 中的属性不计入（字体对象的 state 为每个文档的子集状态，不属于缓存本身）。
+    """
+    seen  = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or callable(item):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.extend(v for k, v in vars(item).items() if k not in skip)
+    return total
+
+
+class FontCache():
+    """
+    进程内共享的 TTF 字体缓存。
+    以 (字体名, 路径, 修改时间, 文件大小) 为键，每个字体文件在进程中只解析一次，
+    之后所有 PDF 对象与所有转换都复用同一个 TTFont 对象。
+    设置 snapshot_dir 后，解析结果还会保存为磁盘上的字体快照，
+    之后的新进程直接从快照恢复字体对象，不再解析 TTF（用于缩短冷启动时间）。
+    """
+    def __init__(self, snapshot_dir=None):
+        self.fonts  = {}                                                        # (name, path, mtime, size) -> TTFont
+        self.sizes  = {}                                                        # 同一键 -> 字体对象占用的内存字节数（首次统计时测量）
+        self.hits   = 0                                                         # 命中次数
+        self.misses = 0                                                         # 未命中（实际解析字体）次数
+        self.snapshot_dir   = snapshot_dir                                      # 字体快照目录，None 时不使用快照
+        self.snapshot_loads = 0                                                 # 从快照恢复的次数
+
+    def get(self, name, path):
+        """获取（必要时解析）字体对象"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key  = (name, path, stat.st_mtime_ns, stat.st_size)
+
+        font = self.fonts.get(key)
+        if font is not None:
+            self.hits += 1
+            return font
+
+        self.misses += 1
+        font = self.load_snapshot(name, path, stat) if self.snapshot_dir else None
+        if font is None:
+            from reportlab.pdfbase.ttfonts import TTFont
+            font = TTFont(name, path)
+            if self.snapshot_dir:
+                self.save_snapshot(font, path, stat)
+        # 同名同路径的旧版本字体文件已失效，移出缓存
+        for old_key in [k for k in self.fonts if k[:2] == key[:2]]:
+            del self.fonts[old_key]
+            self.sizes.pop(old_key, None)
+        self.fonts[key] = font
+        return font
+
+    def snapshot_path(self, path, stat):
+        """字体快照文件路径：由字体文件的路径、修改时间、大小与 reportlab 版本决定"""
+        import reportlab
+        key = "%s|%s|%s|%s|%s" % (path, stat.st_mtime_ns, stat.st_size, reportlab.Version, FONT_SNAPSHOT_VERSION)
+        return os.path.join(self.snapshot_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".font")
+
+    def save_snapshot(self, font, path, stat):
+        """保存解析好的字体对象（不含每个文档的子集状态）"""
+        snapshot = {
+            "font": {k: v for k, v in vars(font).items() if k not in ("fontName", "face", "state")},
+            "face": {k: v for k, v in vars(font.face).items() if k != "_pdfScale"},   # _pdfScale 是无法序列化的函数，恢复时重建
+        }
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            snapshot_path = self.snapshot_path(path, stat)
+            tmp_path = "%s.%s.tmp" % (snapshot_path, os.getpid())
+            with open(tmp_path, "wb") as file:
+                pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, snapshot_path)
+        except OSError:
+            pass                                                                # 快照目录不可写时仅在内存中使用
+
+    def load_snapshot(self, name, path, stat):
+        """从快照恢复字体对象，没有可用的快照时返回 None"""
+        try:
+            with open(self.snapshot_path(path, stat), "rb") as file:
+                snapshot = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        from reportlab.pdfbase.ttfonts import TTFont, TTFontFace
+        face = TTFontFace.__new__(TTFontFace)
+        face.__dict__.update(snapshot["face"])
+        if face.unitsPerEm == 1000:
+            face._pdfScale = lambda x: x
+        else:
+            scale = 1000 / face.unitsPerEm
+            face._pdfScale = lambda x: x * scale
+
+        font = TTFont.__new__(TTFont)
+        font.__dict__.update(snapshot["font"])
+        font.fontName = name
+        font.face     = face
+        font.state    = WeakKeyDictionary()                                     # 每个文档的子集状态
+        self.snapshot_loads += 1
+        return font
+
+    def register(self, name, path):
+        """在reportlab中注册字体对象（已注册的同一对象不再重复注册）"""
+        from reportlab.pdfbase import pdfmetrics
+        font = self.get(name, path)
+        try:
+            registered = pdfmetrics.getFont(name)
+        except KeyError:
+            registered = None
+        if registered is not font:
+            pdfmetrics.registerFont(font)
+        return font
+
+    def stats(self):
+        """缓存统计：命中/未命中次数、缓存的字体数量、字体文件的总大小，以及字体对象实际占用的内存字节数"""
+        for key, font in self.fonts.items():
+            if key not in self.sizes:
+                self.sizes[key] = object_bytes(font)                            # 字体对象加载后不再变化，只测量一次
+        return {
+            "hits":           self.hits,
+            "misses":         self.misses,
+            "snapshot_loads": self.snapshot_loads,
+            "faces":          len(self.fonts),
+            "file_bytes":     sum(key[3] for key in self.fonts),
+            "memory_bytes":   sum(self.sizes.values()),
+        }
+
+    def clear(self):
+        self.fonts.clear()
+        self.sizes.clear()
+        self.hits   = 0
+        self.misses = 0
+        self.snapshot_loads = 0
+
+
+font_cache = FontCache()                                                        # 进程级字体缓存
+
+
+class WidthTable():
+    """
+    字形宽度表。
+    从 TTF 字体的 hmtx/cmap 中读出每个码位的字形宽度（单位为千分之一字号），
+    以码位为下标存储在紧凑的 float32 数组中，未收录的码位使用字体默认宽度。
+    """
+    cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "txt2pdf")      # 宽度表缓存文件目录
+    loaded    = {}                                                              # 进程内缓存：(path, mtime, size) -> WidthTable
+
+    def __init__(self, widths, default):
+        self.widths  = widths                                                   # array('f')，下标为码位
+        self.default = default                                                  # 默认宽度
+        self.digest  = None                                                     # 字体文件的 sha1（由 load 设置）
+
+    def text_width(self, text, size):
+        """获取字符串渲染后的宽度"""
+        table = self.widths
+        try:
+            total = sum(map(table.__getitem__, map(ord, text)))
+        except IndexError:
+            limit = len(table)
+            total = 0
+            for char in text:
+                code = ord(char)
+                total += table[code] if code < limit else self.default
+        return total * size / 1000
+
+    @classmethod
+    def from_ttf(cls, font_path):
+        """解析 TTF 字体文件，构建宽度表"""
+        from reportlab.pdfbase.ttfonts import TTFontFile
+        face  = TTFontFile(font_path)
+        table = array('f', [face.defaultWidth]) * (max(face.charWidths) + 1)
+        for code, width in face.charWidths.items():
+            table[code] = width
+        return cls(table, face.defaultWidth)
+
+    @classmethod
+    def load(cls, font_path):
+        """
+        获取字体的宽度表。
+        依次查找进程内缓存、以字体文件哈希命名的缓存文件，都未命中时才解析字体并写入缓存文件。
+        """
+        path = os.path.abspath(font_path)
+        stat = os.stat(path)
+        key  = (path, stat.st_mtime_ns, stat.st_size)
+        if key in cls.loaded:
+            return cls.loaded[key]
+
+        with open(path, "rb") as file:
+            digest = hashlib.sha1(file.read()).hexdigest()
+        cache_path = os.path.join(cls.cache_dir, digest + ".widths")
+
+        try:
+            # 缓存文件格式：宽度数组，末尾追加一个默认宽度
+            table = array('f')
+            with open(cache_path, "rb") as file:
+                table.frombytes(file.read())
+            default = table.pop()
+            widths  = cls(table, default)
+        except (OSError, IndexError):
+            widths = cls.from_ttf(path)
+            try:
+                os.makedirs(cls.cache_dir, exist_ok=True)
+                tmp_path = "%s.%s.tmp" % (cache_path, os.getpid())
+                with open(tmp_path, "wb") as file:
+                    file.write(widths.widths.tobytes())
+                    file.write(array('f', [widths.default]).tobytes())
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                pass                                                            # 缓存目录不可写时仅在内存中使用
+
+        widths.digest = digest
+        for old_key in [k for k in cls.loaded if k[0] == path]:
+            del cls.loaded[old_key]
+        cls.loaded[key] = widths
+        return widths
+
+
+class Instrument():
+    """
+    转换过程的分阶段计时与计数。
+    stage() 记录某一阶段的墙钟时间与 CPU 时间（同名阶段累加），count() 累加计数。
+    不传入 Instrument 时转换流程不做任何记录。
+    """
+    def __init__(self):
+        self.stages = {}                                                        # 阶段 -> {"wall": 秒, "cpu": 秒}
+        self.counts = {}                                                        # 计数项 -> 数值
+
+    @contextmanager
+    def stage(self, name):
+        wall = time.perf_counter()
+        cpu  = time.process_time()
+        try:
+            yield self
+        finally:
+            item = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            item["wall"] += time.perf_counter() - wall
+            item["cpu"]  += time.process_time() - cpu
+
+    def add_time(self, name, wall, cpu):
+        """直接累加某一阶段的耗时（用于无法用 stage() 包住的零散耗时）"""
+        item = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+        item["wall"] += wall
+        item["cpu"]  += cpu
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def report(self):
+        return {
+            "stages": {name: dict(item) for name, item in self.stages.items()},
+            "counts": dict(self.counts),
+        }
+
+    def save(self, path):
+        """将报告写入 JSON 文件"""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+
+
+class CountingCanvas():
+    """
+    带计数的画布代理：统计写入的文本对象与链接注释数量，其余调用原样转发。
+    只在启用 Instrument 时使用。
+    """
+    def __init__(self, c, instrument):
+        self._c          = c
+        self._instrument = instrument
+
+    def drawText(self, *args, **kwargs):
+        self._instrument.count("text_objects")
+        return self._c.drawText(*args, **kwargs)
+
+    def linkAbsolute(self, *args, **kwargs):
+        self._instrument.count("links")
+        return self._c.linkAbsolute(*args, **kwargs)
+
+    def _addAnnotation(self, *args, **kwargs):
+        self._instrument.count("links")                                         # 直接添加的（共用跳转目标的）链接注释
+        return self._c._addAnnotation(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._c, name)
+
+
+class NullCanvas():
+    """
+    只测量不绘制的画布。
+    用于排版测量：所有绘制调用都被忽略，仅保留 PDF 对象自身的坐标与页码推进。
+    """
+    def _nothing(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return self._nothing
+
+
+class PageCompressor():
+    """
+    页面内容流的并行压缩。
+    reportlab 默认在保存时逐页串行压缩；这里在每页结束（showPage）时就把该页内容流交给线程池压缩
+    （zlib 压缩时释放 GIL），保存前由 finish() 把压缩结果作为各页的内容流。线程池在进程内共享。
+    """
+    pool = None
+
+    def __init__(self, c, level):
+        self.c       = c
+        self.level   = level
+        self.pending = []                                                       # [(页面对象, 压缩结果的 future), ...]
+        c.setPageCallBack(self.on_page)
+
+    @classmethod
+    def executor(cls):
+        if cls.pool is None:
+            cls.pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="compress")
+        return cls.pool
+
+    def on_page(self, page_num):
+        page = self.c._doc.Pages.pages[-1]
+        data = page.stream.encode("utf8") if isinstance(page.stream, str) else page.stream
+        self.pending.append((page, self.executor().submit(zlib.compress, data, self.level)))
+        page.stream = None                                                      # 只保留压缩后的内容
+
+    def finish(self):
+        """等待所有页面压缩完成，设置为各页的内容流（已有 Filter 时 reportlab 不再压缩）"""
+        from reportlab.pdfbase import pdfdoc
+        for page, future in self.pending:
+            stream = pdfdoc.PDFStream(content=future.result())
+            stream.dictionary["Filter"] = pdfdoc.PDFArray([pdfdoc.PDFName("FlateDecode")])
+            stream.__Comment__ = "page stream"
+            page.Contents = stream
+        self.pending = []
+
+
+def encode_page(data, level, a85=False):
+    """按 zlib 级别 level 压缩页面内容流（0 为不压缩），a85=True 时再转为 ASCII85 文本（与 reportlab 的默认过滤器相同）"""
+    if level:
+        data = zlib.compress(data, level)
+    if a85:
+        from reportlab.pdfbase.pdfdoc import PDFBase85Encode
+        data = PDFBase85Encode.encode(data)
+        if isinstance(data, str):
+            data = data.encode("latin-1")
+    return data
+
+
+class SpooledNames(dict):
+    """
+    reportlab 的对象名 -> (对象编号, 版本) 表。
+    已写入暂存文件的页面（"Page1" 等）从表中移除，按页序号在 pages（各页页面对象的编号）中查出。
+    """
+    def __init__(self, items, pages):
+        super().__init__(items)
+        self.pages = pages
+
+    def __missing__(self, name):
+        if name.startswith("Page") and name[4:].isdigit() and 0 < int(name[4:]) <= len(self.pages):
+            return (self.pages[int(name[4:]) - 1], 0)
+        raise KeyError(name)
+
+
+class PageSpool():
+    """
+    页面的磁盘暂存（低内存模式）。
+    每页结束（showPage）时把该页的内容流（按需压缩后）、页面字典与自带跳转目标的链接注释作为完整的 PDF 对象
+    写入临时文件，并从 reportlab 的对象表中移除：内存中每页只剩各对象在暂存文件中的偏移与页面对象的编号（array）。
+    保存时由 save() 代替 reportlab 写出文件：文件头、暂存的对象、仍由 reportlab 管理的其余对象（字体、目录页链接、
+    大纲等），页面树与交叉引用表按偏移与页面编号逐段生成。
+    压缩同样交给 PageCompressor 的线程池，但同时进行中的页数有上限。
+    经由 Destination 跳转的链接（目录页中的链接）要到保存时才绑定目标页，仍留在 reportlab 的对象表中。
+    """
+    def __init__(self, c, level, a85=False):
+        import tempfile
+        doc = c._doc
+        self.c       = c
+        self.level   = level                                                    # zlib 压缩级别，0 为不压缩
+        self.a85     = a85                                                      # 压缩后是否再转为 ASCII85 文本
+        self.filters = (["ASCII85Decode"] if a85 else []) + (["FlateDecode"] if level else [])   # 解码时的过滤器顺序
+        self.file    = tempfile.TemporaryFile(prefix="txt2pdf-spool-")
+        self.offsets = array('q')                                               # 各对象编号在暂存文件（或文件头之后）中的偏移，-1 为未写出
+        self.pages   = array('q')                                               # 各页页面对象的编号
+        self.pending = []                                                       # [(内容流的对象编号, 压缩结果的 future), ...]
+        self.limit   = 2 * (os.cpu_count() or 1)                                # 同时压缩的页数上限
+        doc.idToObjectNumberAndVersion = SpooledNames(doc.idToObjectNumberAndVersion, self.pages)
+        c.setPageCallBack(self.on_page)
+
+    def reserve(self):
+        """分配一个不登记到 reportlab 对象表的对象编号（内容稍后由 put 写入）"""
+        doc = self.c._doc
+        doc.objectcounter += 1
+        return doc.objectcounter
+
+    def place(self, number, offset):
+        if len(self.offsets) <= number:
+            self.offsets.extend([-1] * (number + 1 - len(self.offsets)))
+        self.offsets[number] = offset
+
+    def put(self, number, body):
+        """把编号为 number 的对象写入暂存文件（与 reportlab 的 PDFIndirectObject 格式相同）"""
+        self.place(number, self.file.tell())
+        self.file.write(b"%d 0 obj\n" % number + body + (b"" if body.endswith(b"\n") else b"\n") + b"endobj\n")
+
+    def forget(self, name):
+        """把已写入暂存文件的对象从 reportlab 的对象表中移除，返回它的编号"""
+        doc = self.c._doc
+        number, _ = dict.pop(doc.idToObjectNumberAndVersion, name)
+        del doc.numberToId[number]
+        del doc.idToObject[name]
+        return number
+
+    def on_page(self, page_num):
+        from reportlab.pdfbase import pdfdoc
+        doc      = self.c._doc
+        page     = doc.Pages.pages.pop()                                        # 页面树由 self.pages 在保存时生成
+        name     = page.__InternalName__                                        # reportlab 内部的页面名（"Page1" 等）
+        data     = page.stream.encode("utf8") if isinstance(page.stream, str) else page.stream
+        contents = self.reserve()
+        page.stream   = None
+        page.Contents = b"%d 0 R" % contents                                    # 非 PDFObject 的字节串按原样写出
+        if self.level:
+            self.pending.append((contents, PageCompressor.executor().submit(encode_page, data, self.level, self.a85)))
+            while len(self.pending) > self.limit:
+                self.write_stream(*self.pending.pop(0))
+        else:
+            self.write_stream(contents, None, encode_page(data, 0, self.a85))
+
+        # 页面字典只引用已编号的对象（内容流、注释、字体表、页面树），此时即可写出
+        spooled = []
+        for ref in page.Annots or ():
+            annotation = doc.idToObject[ref.name]
+            if type(annotation) is pdfdoc.LinkAnnotation and isinstance(annotation.Destination, str):   # 命名目标（PDFName）
+                self.put(doc.idToObjectNumberAndVersion[ref.name][0], pdfdoc.format(annotation, doc, toplevel=1))
+                spooled.append(ref.name)
+        self.put(doc.idToObjectNumberAndVersion[name][0], pdfdoc.format(page, doc, toplevel=1))
+        for ref_name in spooled:
+            self.forget(ref_name)
+        self.pages.append(self.forget(name))
+
+    def write_stream(self, number, future, data=None):
+        from reportlab.pdfbase import pdfdoc
+        data = future.result() if future is not None else data
+        dictionary = pdfdoc.PDFDictionary()
+        if self.filters:
+            dictionary["Filter"] = pdfdoc.PDFArray([pdfdoc.PDFName(name) for name in self.filters])
+        dictionary["Length"] = len(data)
+        self.put(number, pdfdoc.format(dictionary, self.c._doc) + b"\nstream\n" + data + b"endstream\n")
+
+    def flush(self):
+        """等待所有页面压缩完成并写入暂存文件（保存前调用）"""
+        for number, future in self.pending:
+            self.write_stream(number, future)
+        self.pending = []
+
+    def write_pages(self, out, number, chunk=4096):
+        """写出页面树（只有一层，与 reportlab 相同），Kids 按页面编号逐段生成"""
+        out.write(b"%d 0 obj\n<<\n/Count %d /Kids [ " % (number, len(self.pages)))
+        for start in range(0, len(self.pages), chunk):
+            out.write(b"".join(b"%d 0 R " % n for n in self.pages[start:start + chunk]))
+        out.write(b"] /Type /Pages\n>>\nendobj\n")
+
+    def save(self, path):
+        """
+        写出 PDF 文件（代替 canvas.save）。
+        步骤与 reportlab 的 PDFDocument.GetPDFData / format 相同，但暂存的对象直接从暂存文件复制，
+        交叉引用表逐段写出；先写入临时文件，完成后再替换 path。
+        """
+        import shutil
+        from reportlab.pdfbase import pdfdoc
+        self.flush()
+        doc = self.c._doc
+        for font in doc.delayedFonts:                                           # 字体子集等到此时才生成对象
+            font.addObjects(doc)
+        doc.info.invariant = doc.invariant
+        doc.info.digest(doc.signature)
+        catalog = doc.Reference(doc.Catalog)
+        info    = doc.Reference(doc.info)
+        doc.Outlines.prepare(doc, self.c)
+        if doc.Outlines.ready < 0:
+            doc.Catalog.Outlines = None
+        doc.encrypt.prepare(doc)
+        encrypt = doc.encrypt.info()
+        encrypt = doc.Reference(encrypt) if encrypt else None
+
+        tmp_path = "%s.%s.tmp" % (path, os.getpid())
+        with open(tmp_path, "wb") as out:
+            out.write(pdfdoc.PDFFile(doc._pdfVersion).format(doc))               # 文件头（版本号可能在绘制时被提高）
+            base = out.tell()
+            self.file.seek(0)
+            shutil.copyfileobj(self.file, out)
+            self.file.close()
+
+            number = 0
+            while number < doc.objectcounter:                                   # 格式化时还可能登记新的对象
+                number += 1
+                name = doc.numberToId.get(number)
+                if name is None:
+                    if number >= len(self.offsets) or self.offsets[number] < 0:
+                        raise ValueError("spooled object %d was never written" % number)
+                    continue
+                self.place(number, out.tell() - base)
+                obj = doc.idToObject[name]
+                if obj is doc.Pages:
+                    self.write_pages(out, number)
+                else:
+                    out.write(pdfdoc.PDFIndirectObject(name, obj).format(doc))
+
+            xref = out.tell()
+            out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (number + 1))
+            for start in range(1, number + 1, 4096):
+                out.write(b"".join(b"%010d 00000 n \n" % (offset + base)
+                                   for offset in self.offsets[start:min(start + 4096, number + 1)]))
+            trailer = pdfdoc.PDFTrailer(startxref=xref, Size=number + 1, Root=catalog, Info=info,
+                                        Encrypt=encrypt, ID=doc.ID())
+            out.write(trailer.format(doc))
+        os.replace(tmp_path, path)
+
+
+class TextLayer():
+    """
+    文字绘制层：同一页中连续写入的文字行合并到同一个文本对象（BT ... ET）中，
+    并记住当前的字体、字号、行距与填充色，重复的状态设置不再写入页面内容流。
+    set_font / set_fill 只记录请求的状态，到真正写入文字或矩形时才按需生效。
+    绘制矩形、换页与保存之前先将未写出的文本对象写入画布。
+    """
+    def __init__(self, c, instrument=None):
+        self.c          = c
+        self.instrument = instrument
+        self.text       = None                                                  # 尚未写入画布的文本对象
+        self.line       = None                                                  # 文本对象中下一行的起点 (x, y)
+        self.font       = None                                                  # 请求的 (字体, 字号, 行距)
+        self.reset()
+
+    def reset(self):
+        """新页面的图形状态为默认值"""
+        self.fill      = (0, 0, 0)                                              # 请求的填充色 (r, g, b)
+        self.text_font = None                                                   # 当前文本对象中已生效的 (字体, 字号, 行距)
+        self.page_fill = (0, 0, 0)                                              # 页面中已生效的填充色（默认黑色）
+
+    def set_font(self, name, size, leading):
+        self.font = (name, size, leading)
+
+    def set_fill(self, color):
+        self.fill = color
+
+    def draw(self, x, y, text):
+        """在 (x, y) 处写入一行文字"""
+        t = self.text
+        if t is None:
+            t = self.text = self.c.beginText(x, y)
+            self.text_font = None                                               # 每个文本对象都需要重新设置字体
+        else:
+            line_x, line_y = self.line
+            if abs(x - line_x) > 1e-3 or abs(y - line_y) > 1e-3:
+                t.moveCursor(x - line_x, line_y - y)                            # 相对下一行起点移动，恰为下一行时无需移动
+
+        if self.font != self.text_font:
+            name, size, leading = self.font
+            if self.text_font is not None and self.text_font[:2] == (name, size):
+                t.setLeading(leading)
+            else:
+                t.setFont(name, size, leading)
+            self.text_font = self.font
+
+        if self.fill != self.page_fill:
+            t.setFillColor(self.fill)
+            self.page_fill = self.fill
+
+        t.textLine(text)
+        self.line = (x, y - self.font[2])                                       # 换行（T*）后的下一行起点
+        if self.instrument is not None:
+            self.instrument.count("drawn_lines")
+
+    def rect(self, x, y, width, height):
+        """以当前填充色绘制无边框矩形"""
+        self.flush()
+        if self.fill != self.page_fill:
+            self.c.setFillColor(self.fill)
+            self.page_fill = self.fill
+        self.c.rect(x, y, width, height, stroke=0, fill=1)
+
+    def flush(self):
+        """将未写出的文本对象写入画布"""
+        if self.text is not None:
+            self.c.drawText(self.text)
+            self.text = None
+
+    def do_form(self, name):
+        """在页面中使用名为 name 的表单 XObject（表单在自己的图形状态中绘制，不影响已生效的字体与颜色）"""
+        self.flush()
+        self.c.doForm(name)
+
+    def show_page(self):
+        self.flush()
+        self.c.showPage()
+        self.reset()
+
+    def save(self):
+        self.flush()
+        self.c.save()
             
 
-class PDF():
-    def __init__(self, file_path, font_normal, font_bold, page_size=A4):
+class HeadingIndex():
+    """
+    标题索引：按出现顺序记录每个标题的文字、级别（1-3，合集中各文档的标题为 0）、所在页码与纵坐标（标题顶部，页面坐标）。
+    各列以紧凑的 array 存储；迭代时得到 (文字, 级别, 页码, 纵坐标)。
+    用于生成目录页与文档大纲（书签），大纲的跳转目标精确到标题所在的位置。
+    """
+    __slots__ = ("texts", "levels", "pages", "ys")
+
+    def __init__(self):
+        self.texts  = []
+        self.levels = array('b')
+        self.pages  = array('i')
+        self.ys     = array('f')
+
+    def add(self, text, level, page, y):
+        self.texts.append(text)
+        self.levels.append(level)
+        self.pages.append(page)
+        self.ys.append(y)
+
+    def extend(self, other, page_offset=0):
+        """追加另一个索引的全部标题，页码加上 page_offset"""
+        self.texts.extend(other.texts)
+        self.levels.extend(other.levels)
+        if page_offset:
+            self.pages.extend(page + page_offset for page in other.pages)
+        else:
+            self.pages.extend(other.pages)
+        self.ys.extend(other.ys)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return zip(self.texts, self.levels, self.pages, self.ys)
+
+    def rows(self):
+        """转为可序列化为 JSON 的 [[文字, 级别, 页码, 纵坐标], ...]"""
+        return [list(row) for row in self]
+
+    @classmethod
+    def from_rows(cls, rows):
+        index = cls()
+        for text, level, page, y in rows:
+            index.add(text, level, page, y)
+        return index
 
-        self.file_name = cut_extname(file_path) + ".pdf"
-        self.pdf_name  = get_barefilename(file_path)
-        
-        # 在reportlab中注册字体对象
-        pdfmetrics.registerFont(TTFont('normal', font_normal))
-        pdfmetrics.registerFont(TTFont('bold', font_bold))
 
-        # 创建文档对象
-        self.c = canvas.Canvas(self.file_name, pagesize=page_size)
+class PDF():
+    def __init__(self, file_path, font_normal, font_bold, page_size=None, measure=False, output=None,
+                 instrument=None, first_page=1, defer_links=False, compression=None, catalog=True,
+                 outline=True, deterministic=False, document_id=None, spool=False):
+        """
+        measure=True 时为只测量模式：不注册字体，不创建 reportlab 画布，也不产生任何文件。
+        output 为输出文件路径，默认与 file_path 同名（拓展名改为 .pdf）。
+        instrument 为 Instrument 时统计绘制的文本行与链接数量。
+        first_page 为第一页的页码；defer_links=True 时不创建跳转目标与链接，
+        而是记录在 deferred_links 中（用于分段渲染后合并）。
+        compression 为输出压缩模式（见 COMPRESSION）："none" 不压缩任何数据流；
+        "fast" / "max" 以最快 / 最高级别压缩页面内容流，并在线程池中与排版并行进行；
+        默认 None 沿用 reportlab 的设置（保存时串行压缩）。
+        page_size 为页面尺寸，默认 A4。
+        catalog=False 表示文档不带目录页，此时不在每页写入“返回目录”按钮。
+        outline=True 时为每个标题添加文档大纲（书签）条目，跳转到标题所在位置（分段渲染时由合并步骤添加）。
+        deterministic=True 时输出与生成时间无关：创建日期固定（设置了 SOURCE_DATE_EPOCH 时取其值），
+        文档 ID 只由 document_id（默认为文件名）决定；字体子集标签本来就按子集序号确定。相同输入总是得到相同字节。
+        spool=True 时每页结束即把内容流与页面对象写入临时文件（见 PageSpool），页面不随页数累积在内存中；
+        输出的页面、链接与大纲与不暂存时相同，只是对象编号不同。
+        """
+        if page_size is None:
+            page_size = A4
+
+        self.file_name = output if output else cut_extname(file_path) + ".pdf"
+        self.pdf_name  = get_barefilename(file_path)
+        self.measure   = measure
+        self.catalog   = catalog
+        self.outline   = outline and not measure and not defer_links
+        self.outline_level = -1                                                 # 上一个大纲条目的层级
+        self.outline_base  = 0                                                  # 一级标题在大纲中的层级（合集中为 1）
+
+        # 字形宽度表（测量与渲染共用）
+        self.widths_normal = WidthTable.load(font_normal)
+        self.widths_bold   = WidthTable.load(font_bold)
+
+        self.compressor = None
+        self.spool      = None
+        if measure:
+            self.c = NullCanvas()
+        else:
+            from reportlab.pdfgen import canvas
+
+            # 在reportlab中注册字体对象（经由进程级缓存，每个字体文件只解析一次）
+            font_cache.register('normal', font_normal)
+            font_cache.register('bold', font_bold)
+
+            # 创建文档对象
+            invariant = 1 if deterministic else None                            # None 沿用 reportlab 的设置
+            if compression is None:
+                self.c = canvas.Canvas(self.file_name, pagesize=page_size, invariant=invariant)
+            else:
+                level  = COMPRESSION[compression]
+                self.c = canvas.Canvas(self.file_name, pagesize=page_size, invariant=invariant,
+                                       pageCompression=1 if level else 0)
+                if level and not spool:
+                    self.compressor = PageCompressor(self.c, level)
+            if spool and compression is not None:
+                self.spool = PageSpool(self.c, COMPRESSION[compression])
+            elif spool:
+                from reportlab import rl_config                                 # 与 reportlab 保存时对页面内容流的处理相同
+                compressed = bool(self.c._pageCompression)
+                self.spool = PageSpool(self.c, zlib.Z_DEFAULT_COMPRESSION if compressed else 0,
+                                       a85=compressed and bool(rl_config.useA85))
+            if deterministic:
+                self.c._doc.updateSignature(document_id or self.pdf_name)       # 文档 ID 由签名的摘要生成
+            if instrument is not None:
+                self.c = CountingCanvas(self.c, instrument)
+
+        # 文字与矩形都经由绘制层写入（只测量时什么也不写）
+        self.draw = NullCanvas() if measure else TextLayer(self.c, instrument)
 
         # 页面坐标相关配置
         self.page_width, self.page_height = page_size                           # 文档页面长宽
@@ -144,64 +1021,183 @@ class PDF():
         self.pagefoot_size = int(10 * ratio)
 
         # 颜色
-        self.color_text = Color(0.1, 0.1, 0.1)
-        self.color_h2 = Color(0.6, 0.7, 1)
-        self.color_h3 = Color(1, 0.9, 0.6)
+        self.color_text = (0.1, 0.1, 0.1)
+        self.color_h2 = (0.6, 0.7, 1)
+        self.color_h3 = (1, 0.9, 0.6)
 
         # 跳转标记
-        self.page_num = 1                                                       # 页码
+        self.first_page = first_page
+        self.page_num = first_page                                              # 页码
+        self.deferred_links = [] if defer_links else None                       # 延后添加的链接 [(所在页, 区域, 目标页, 是否共用目标), ...]
+        self.link_targets   = set()                                             # 被链接到的页码，保存时只为这些页面创建跳转目标
+        self.shared_targets = set()                                             # 经由文档级命名目标跳转的页码
+        if catalog and not measure:
+            self.define_homelink()
         self.write_pagefoot()                                                   # 写页码
-        self.c.bookmarkPage("p%s" % self.page_num)                              # 令当前页面可被跳转到
-        self.link_num = 0                                                       # 文档中的链接数量，用于给链接编号
+        self.link_num = 0                                                       # 文档中的链接数量
 
-        # 标题-页码表
-        self.heading_table = []                                                 # 用于写目录，同时存储链接跳转点[["h_text", "hx", page_num], ...]
+        # 标题索引
+        self.heading_table = HeadingIndex()                                     # 用于写目录与文档大纲
+
+        # 章节缓存（见 begin_chapter / replay_chapter）
+        self.body_start = 0                                                     # 当前页的正文在画布代码中的起点（页码等固定内容之后）
+        self.recording  = None                                                  # 记录中的一章已结束的各页的正文
 
     def save(self):
         # 保存到本地文件
-        self.c.save()
+        self.bind_destinations()
+        if self.compressor is not None:
+            self.draw.show_page()                                               # 最后一页也先交给线程池压缩
+            self.compressor.finish()
+        if self.spool is not None:
+            self.draw.show_page()                                               # 最后一页也先写入暂存文件
+            self.spool.flush()
+        if self.spool is not None:
+            self.spool.save(self.file_name)                                     # 由暂存代替 reportlab 写出文件
+        else:
+            self.draw.save()
 
     def write_pagefoot(self):
         # 在页面底部写入页码
         size = self.pagefoot_size
-        self.c.setFont('normal', size)
+        self.draw.set_font('normal', size, size + self.line_margin)
         x = (self.page_width - len(str(self.page_num)) * size) / 2
         y = 10
-        self.c.drawString(x, y, str(self.page_num))
+        self.draw.draw(x, y, str(self.page_num))
 
     def enter_newpage(self):
         # 创建并进入新的页面
-        self.c.showPage()
+        if self.recording is not None:
+            self.recording.append(self.page_body())
+        self.draw.show_page()
         self.page_num += 1                                                      # 更新页码
         self.pos = [self.page_margin, self.page_height - self.page_margin]      # 更新"写入位置"坐标
         self.write_pagefoot()                                                   # 写页码
-        self.c.bookmarkPage("p%s" % self.page_num)                              # 令当前页面可被跳转到
 
-        self.write_homelink(2)
+        if self.catalog:
+            self.write_homelink(2)
+        if not self.measure:
+            self.draw.flush()                                                   # 固定内容自成文本对象，正文的字节与页码无关
+            self.body_start = len(self.c._code)
+
+    def page_body(self):
+        """当前页中页码与“返回目录”之后写入的全部内容（页面内容流中的一段）"""
+        self.draw.flush()
+        return "\n".join(self.c._code[self.body_start:])
+
+    def font_codes(self):
+        """
+        各字体在本文档中陆续分配了字形编码的字符，按编码顺序连成字符串（不含预先分配的 ASCII 字符）。
+        reportlab 按字符首次出现的顺序递增地分配字体子集中的编码，按同样顺序重新分配即得到相同的编码（见 seed_fonts）。
+        """
+        from reportlab.pdfbase import pdfmetrics
+        codes = {}
+        for name in ("normal", "bold"):
+            state = pdfmetrics.getFont(name).state.get(self.c._doc)
+            assignments = sorted((code, char) for char, code in state.assignments.items()
+                                 if code != char or 0 < char < 32 or char > 127) if state else ()
+            codes[name] = "".join(chr(char) for code, char in assignments)
+        return codes
+
+    def seed_fonts(self, codes):
+        """按 font_codes 的结果预先分配字形编码（须在写入任何非 ASCII 文字之前调用）"""
+        from reportlab.pdfbase import pdfmetrics
+        for name in ("normal", "bold"):
+            font = pdfmetrics.getFont(name)
+            font.splitString(codes.get(name, ""), self.c._doc)
+            font.getSubsetInternalName(0, self.c._doc)                          # 固定各字体在文档中的名称（/F2、/F3）
+
+    def begin_chapter(self):
+        """
+        开始一章（章节缓存）：与 write_h1 一样先换页，随后可以重放保存的记录（replay_chapter），
+        或照常写入并由 end_chapter 取回各页的正文。一章必须以一级标题开头。
+        """
+        if self.pos[1] < self.page_height - self.page_margin:
+            self.enter_newpage()
+        self.recording = []
+        self.chapter_state = [list(self.draw.fill), list(self.draw.page_fill)]
+
+    def end_chapter(self):
+        """结束记录，返回可由 replay_chapter 重放的记录（可序列化为 JSON）"""
+        pages = self.recording + [self.page_body()]
+        self.recording = None
+        return {
+            "start": self.chapter_state,                                        # 开始时请求的与已生效的填充色
+            "pages": pages,
+            "end":   [list(self.draw.font), list(self.draw.fill), list(self.draw.page_fill), self.pos[1]],
+            "codes": {name: [len(text), hashlib.sha1(text.encode("utf-8")).hexdigest()]
+                      for name, text in self.font_codes().items()},             # 正文用到的字形编码（前缀）
+        }
+
+    def can_replay(self, record, codes):
+        """record 能否在当前文档中重放：开始时的图形状态相同，且 codes（本文档的 font_codes）与记录时的编码前缀一致"""
+        if record["start"] != self.chapter_state:
+            return False
+        for name, (length, digest) in record["codes"].items():
+            text = codes.get(name, "")
+            if len(text) < length or hashlib.sha1(text[:length].encode("utf-8")).hexdigest() != digest:
+                return False
+        return True
+
+    def replay_chapter(self, record, headings):
+        """
+        在 begin_chapter 之后重放 end_chapter 的记录：逐页写入记录的正文，页码与“返回目录”按当前页码重新写入。
+        headings 为该章的标题行 [(文字, 级别, 章内页码, 纵坐标), ...]（章内第一页为 1），用于标题索引与大纲。
+        """
+        self.recording = None
+        headings = list(headings)
+        for n, body in enumerate(record["pages"]):
+            if n:
+                self.enter_newpage()
+            if body:
+                self.c._code.append(body)
+            for text, level, page, y in headings:
+                if page == n + 1:
+                    self.pos[1] = y
+                    self.mark_heading(text, level)
+        font, fill, page_fill, self.pos[1] = record["end"]
+        self.draw.set_font(*font)
+        self.draw.set_fill(tuple(fill))
+        self.draw.page_fill = tuple(page_fill)
 
     def change_page_if_needed(self, size):
         # 判断下一行是否将超出页面内容最大高度，是则进行换页
         if self.pos[1] - size < self.page_margin:
             self.enter_newpage()
 
+    def write_section(self, text):
+        """
+        合集模式：从新的一页开始写入一篇文档的标题页，并作为 0 级标题记录。
+        此后各级标题在大纲中都位于该文档之下。
+        """
+        if self.pos[1] < self.page_height - self.page_margin:
+            self.enter_newpage()
+        self.outline_base = 1
+        self.mark_heading(text, 0)
+        self.write_doctitle(text)
+
     def write_doctitle(self, text="default"):
         # 写入文档标题（自动换页）
         if text=="default":
             text = self.pdf_name
         size = self.doctitle_size
-        self.c.setFont('bold', size)
-        self.c.drawString(self.pos[0], self.pos[1] - size, text)
+        self.draw.set_font('bold', size, size + self.line_margin)
+        self.draw.draw(self.pos[0], self.pos[1] - size, text)
         self.enter_newpage()
 
-    def write_content(self, text):
-        # 写入内容
-        text = freeze_tab(text)
+    def split_contents(self, texts, vectorize=True):
+        """对多段正文批量分行（见 split_contents），结果可传给 write_content 的 lines 参数"""
+        return split_contents(texts, self.content_size, self.content_width, self.widths_normal, vectorize)
+
+    def write_content(self, text, lines=None):
+        # 写入内容（lines 为预先分好的行时不再重新分行）
         size = self.content_size
-        lines = split_lines_by_pagewidth(text, size, self.content_width)
-        self.c.setFont('normal', size)
+        if lines is None:
+            lines = split_tabbed_lines(text, size, self.content_width, widths=self.widths_normal)
+        self.draw.set_font('normal', size, size + self.line_margin)
         for line in lines:
             self.change_page_if_needed(size)
-            self.c.drawString(self.pos[0], self.pos[1] - size, line)
+            self.draw.draw(self.pos[0], self.pos[1] - size, line)
             self.pos[1] = self.pos[1] - size - self.line_margin
 
     def write_h1(self, text, center=False):
@@ -213,7 +1209,7 @@ class PDF():
             
         size = self.heading1_size
         gap  = int(size // 5)
-        self.c.setFont('bold', size)
+        self.draw.set_font('bold', size, size + self.line_margin)
         self.change_page_if_needed(size)
 
         # 如果居中
@@ -222,18 +1218,18 @@ class PDF():
         else:
             x = self.pos[0]
 
-        self.c.drawString(x, self.pos[1] - size, text)                          # 写入文字
-        self.heading_table.append([text, "h1", self.page_num])                  # 储存标题
+        self.draw.draw(x, self.pos[1] - size, text)                             # 写入文字
+        self.mark_heading(text, 1)                                              # 储存标题
         self.pos[1] = self.pos[1] - size - self.line_margin - gap               # 重置“写入位置”
 
     def write_h2(self, text):
         # 写入二级标题
         size = self.heading2_size
         gap  = int(size // 5)
-        self.c.setFont('bold', size)
+        self.draw.set_font('bold', size, size + self.line_margin)
         self.change_page_if_needed(size)
-        self.c.drawString(self.pos[0], self.pos[1] - size - gap, text)          # 写入文字
-        self.heading_table.append([text, "h2", self.page_num])                  # 储存标题
+        self.draw.draw(self.pos[0], self.pos[1] - size - gap, text)             # 写入文字
+        self.mark_heading(text, 2)                                              # 储存标题
         self.pos[1] = self.pos[1] - size - self.line_margin - gap * 2           # 重置“写入位置”
 
     def write_h2color(self, text):
@@ -242,74 +1238,78 @@ class PDF():
         gap  = int(size // 5)
 
         # 绘制矩形
-        self.c.setFillColor(self.color_h2)
+        self.draw.set_fill(self.color_h2)
         x = self.pos[0]
         y = self.pos[1] - gap - size - gap
         width  = self.page_width - 2 * self.page_margin
         height = size
-        self.c.rect(x, y, width, height + gap, stroke=0, fill=1)
-        self.c.setFillColor(Color(0.1, 0.1, 0.1))
+        self.draw.rect(x, y, width, height + gap)
+        self.draw.set_fill((0.1, 0.1, 0.1))
 
         # 写入文字
-        self.c.setFont('bold', size)
+        self.draw.set_font('bold', size, size + self.line_margin)
         self.change_page_if_needed(size)
-        self.c.drawString(self.pos[0], self.pos[1] - size - gap, text)          # 写入文字
-        self.heading_table.append([text, "h2", self.page_num])                  # 储存标题
+        self.draw.draw(self.pos[0], self.pos[1] - size - gap, text)             # 写入文字
+        self.mark_heading(text, 2)                                              # 储存标题
         self.pos[1] = self.pos[1] - size - self.line_margin - gap * 2           # 重置“写入位置”
 
     def write_h3(self, text):
         # 写入三级标题
         size = self.heading3_size
         gap  = int(size // 5)
-        self.c.setFont('bold', size)
+        self.draw.set_font('bold', size, size + self.line_margin)
         self.change_page_if_needed(size)
-        self.c.drawString(self.pos[0], self.pos[1] - size - gap, text)          # 写入文字
-        self.heading_table.append([text, "h3", self.page_num])                  # 储存标题
+        self.draw.draw(self.pos[0], self.pos[1] - size - gap, text)             # 写入文字
+        self.mark_heading(text, 3)                                              # 储存标题
         self.pos[1] = self.pos[1] - size - self.line_margin - gap * 2           # 重置“写入位置”
 
     def write_h3color(self, text):
-        # 写入二级标题 - 修改中
+        # 写入三级标题 - 修改中
         size = self.heading3_size
         gap  = int(size // 5)
 
         # 绘制矩形
-        self.c.setFillColor(self.color_h3)
+        self.draw.set_fill(self.color_h3)
         x = self.pos[0]
         y = self.pos[1] - gap - size - gap
         width  = (self.page_width - 2 * self.page_margin) * 0.85
         height = size
-        self.c.rect(x, y, width, height + gap, stroke=0, fill=1)
-        self.c.setFillColor(Color(0.1, 0.1, 0.1))
+        self.draw.rect(x, y, width, height + gap)
+        self.draw.set_fill((0.1, 0.1, 0.1))
 
         # 写入文字
-        self.c.setFont('bold', size)
+        self.draw.set_font('bold', size, size + self.line_margin)
         self.change_page_if_needed(size)
-        self.c.drawString(self.pos[0], self.pos[1] - size - gap, text)          # 写入文字
-        self.heading_table.append([text, "h2", self.page_num])                  # 储存标题
+        self.draw.draw(self.pos[0], self.pos[1] - size - gap, text)             # 写入文字
+        self.mark_heading(text, 3)                                              # 储存标题
         self.pos[1] = self.pos[1] - size - self.line_margin - gap * 2           # 重置“写入位置”
 
+    def mark_heading(self, text, level):
+        """在标题索引中记录当前位置的标题，并添加指向该位置的大纲条目"""
+        self.heading_table.add(text, level, self.page_num, self.pos[1])
+        if self.outline:
+            key = "h%s" % len(self.heading_table)
+            self.c.bookmarkHorizontalAbsolute(key, self.pos[1])
+            depth = level - 1 + self.outline_base
+            self.outline_level = min(depth, self.outline_level + 1)             # 大纲层级不能跳级（如一级标题下直接是三级标题）
+            self.c.addOutlineEntry(text, key, self.outline_level)
+
     def write_link(self, text, page_num):
         # 写入链接内容
         size = self.content_size
-        self.c.setFont('normal', size)
-        self.c.setFillColor(Color(0, 0, 1))
+        self.draw.set_font('normal', size, size + self.line_margin)
+        self.draw.set_fill((0, 0, 1))
         self.change_page_if_needed(size)
         
-        self.c.drawString(self.pos[0], self.pos[1] - size, text)
-        self.c.setFillColor(Color(0, 0, 0))
+        self.draw.draw(self.pos[0], self.pos[1] - size, text)
+        self.draw.set_fill((0, 0, 0))
         self.pos[1] = self.pos[1] - size - self.line_margin
 
-        width  = self.pos[0] + get_textwidth(text, size)
+        width  = self.pos[0] + get_textwidth(text, size, self.widths_normal)
         height = self.pos[1] + size
         rect = (self.pos[0], self.pos[1], width, height)
         
-        self.link_num += 1
-        self.c.linkAbsolute(
-            f"link_{self.link_num}",    # 该按钮名为 f"link_{self.link_num}"，其作用不明
-            f"p{page_num}",             # 跳转到 f"p{page_num}" 目标点所在的页面
-            rect,                       # 跳转按钮在激活页面上占据的矩形区域
-            thickness=0,                # 跳转按钮的边框宽度，单位是像素
-        )
+        self.write_linkbutton(rect, page_num)
 
     def write_halflink(self, text, page_num, bold=False):
         """写入带有尾部链接的普通文本"""
@@ -317,92 +1317,144 @@ class PDF():
         text = freeze_tab(text)
         tail_text = " [跳转到]"
         size = self.content_size
+        self.change_page_if_needed(size)                                        # 目录超过一页时换页
         if bold:
-            self.c.setFont('bold', size)
+            self.draw.set_font('bold', size, size + self.line_margin)
+            widths = self.widths_bold
         else:
-            self.c.setFont('normal', size)
-        self.c.drawString(self.pos[0], self.pos[1] - size, text)
+            self.draw.set_font('normal', size, size + self.line_margin)
+            widths = self.widths_normal
+        self.draw.draw(self.pos[0], self.pos[1] - size, text)
         # self.pos[1] = self.pos[1] - size - self.line_margin
 
         # 写入尾部链接文字
-        self.c.setFillColor(Color(0, 0, 1))
-        x = self.pos[0] + get_textwidth(text, size)
-        self.c.drawString(x, self.pos[1] - size, tail_text)
-        self.c.setFillColor(Color(0, 0, 0))
+        self.draw.set_fill((0, 0, 1))
+        x = self.pos[0] + get_textwidth(text, size, widths)
+        self.draw.draw(x, self.pos[1] - size, tail_text)
+        self.draw.set_fill((0, 0, 0))
         self.pos[1] = self.pos[1] - size - self.line_margin
 
         # 写入尾部链接按钮
-        width  = x + get_textwidth(tail_text, size)
+        width  = x + get_textwidth(tail_text, size, widths)
         height = self.pos[1] + size
         rect = (x, self.pos[1], width, height)
-        self.link_num += 1
-        self.c.linkAbsolute(
-            f"link_{self.link_num}",    # 该按钮名为 f"link_{self.link_num}"，其作用不明
-            f"p{page_num}",             # 跳转到 f"p{page_num}" 目标点所在的页面
-            rect,                       # 跳转按钮在激活页面上占据的矩形区域
-            thickness=0,                # 跳转按钮的边框宽度，单位是像素
-        )
+        self.write_linkbutton(rect, page_num)
+
+    def write_catalog(self, heading_table, offset=0):
+        """写目录。heading_table 可以是另一个 PDF 对象（取其标题索引），也可以直接是 HeadingIndex。"""
+        if isinstance(heading_table, PDF):
+            heading_table = heading_table.heading_table
 
-    def write_catalog(self, pdf, offset=0):
-        # 写目录
         self.write_h1("目录", center=True)
         self.write_content(" ")
 
-        for item in pdf.heading_table:
-            if item[1] == "h1":
+        for item in heading_table:
+            if item[1] == 0:
+                text = "【" + item[0] + "】"
+                spare_width = self.page_width - 2 * self.page_margin - get_textwidth(text + "  999" + " [跳转到]", self.content_size, self.widths_bold)
+                char_num    = int(spare_width // get_textwidth(".", self.content_size, self.widths_bold))
+                char_num    = char_num if char_num >= 0 else 0
+
+                text = text + " " + "." * char_num + " " + str(item[2] + offset)
+
+                self.write_halflink(text, item[2] + offset, bold=True)
+
+            if item[1] == 1:
 
-                spare_width = self.page_width - 2 * self.page_margin - get_textwidth(item[0] + "999" + " [跳转到]", self.content_size)
-                char_num    = int(spare_width * 2 // self.content_size) - 2
+                spare_width = self.page_width - 2 * self.page_margin - get_textwidth(item[0] + "  999" + " [跳转到]", self.content_size, self.widths_bold)
+                char_num    = int(spare_width // get_textwidth(".", self.content_size, self.widths_bold))
                 char_num    = char_num if char_num >= 0 else 0
                 
                 text = item[0] + " " + "." * char_num + " " + str(item[2] + offset)
 
                 self.write_halflink(text, item[2] + offset, bold=True)
                 
-            if item[1] == "h2":
+            if item[1] == 2:
                 indent = 3 * " "
-                spare_width = self.page_width - 2 * self.page_margin - get_textwidth(indent + item[0] + "999" + " [跳转到]", self.content_size)
-                char_num    = int(spare_width * 2 // self.content_size) - 2
+                spare_width = self.page_width - 2 * self.page_margin - get_textwidth(indent + item[0] + "  999" + " [跳转到]", self.content_size, self.widths_normal)
+                char_num    = int(spare_width // get_textwidth(".", self.content_size, self.widths_normal))
                 char_num    = char_num if char_num >= 0 else 0
                 
                 text = "   " + item[0] + " " + "." * char_num + " " + str(item[2] + offset)
 
                 self.write_halflink(text, item[2] + offset)
                 
-            if item[1] == "h3":
+            if item[1] == 3:
                 indent = 6 * " "
-                spare_width = self.page_width - 2 * self.page_margin - get_textwidth(indent + item[0] + "999" + " [跳转到]", self.content_size)
-                char_num    = int(spare_width * 2 // self.content_size) - 2
+                spare_width = self.page_width - 2 * self.page_margin - get_textwidth(indent + item[0] + "  999" + " [跳转到]", self.content_size, self.widths_normal)
+                char_num    = int(spare_width // get_textwidth(".", self.content_size, self.widths_normal))
                 char_num    = char_num if char_num >= 0 else 0
                 
                 text = "      " + item[0] + " " + "." * char_num + " " + str(item[2] + offset)
 
                 self.write_halflink(text, item[2] + offset)
 
-    def write_homelink(self, page_num):
-        """写入每页右上角的【返回目录】按钮"""
-        # 写入链接文本
-        text = "返回目录"
-        size = self.content_size
-        self.c.setFont('normal', size)
-        self.c.setFillColor(Color(0, 0, 1))
-        x = self.page_width - get_textwidth(text, size) - 5
-        y = self.page_height - size - 5
-        self.c.drawString(x, y, text)
-        self.c.setFillColor(Color(0, 0, 0))
-
-        # 写入链接按钮
-        width  = x + get_textwidth(text, size)
-        height = y + size
-        rect = (x, y, width, height)
+    def write_linkbutton(self, rect, page_num, shared=False):
+        """
+        在当前页面的 rect 区域放置跳转到第 page_num 页的链接按钮。
+        shared=True 时链接经由文档级的命名目标跳转，大量指向同一页的链接（如每页的“返回目录”）共用一个目标；
+        否则跳转目标直接写在链接注释中。
+        """
         self.link_num += 1
+        if self.measure:
+            return                                                              # 只测量时不创建链接注释，也不需要跳转目标
+        if self.deferred_links is not None:
+            # 分段渲染时页面目标可能不在本文档中，先记录下来，合并时再统一添加
+            self.deferred_links.append((self.page_num, rect, page_num, shared))
+            return
+        if shared:
+            from reportlab.pdfbase.pdfdoc import LinkAnnotation, PDFName
+            self.shared_targets.add(page_num)
+            self.c._addAnnotation(LinkAnnotation(rect, "", PDFName("p%s" % page_num), Border="[0 0 0]"))
+            return
+        self.link_targets.add(page_num)
         self.c.linkAbsolute(
-            f"link_{self.link_num}",    # 该按钮名为 f"link_{self.link_num}"，其作用不明
-            f"p{page_num}",             # 跳转到 f"p{page_num}" 目标点所在的页面
+            "",                         # 链接注释的说明文字（不需要）
+            f"p{page_num}",             # 跳转到 f"p{page_num}" 目标点所在的页面（保存时由 bind_destinations 创建）
             rect,                       # 跳转按钮在激活页面上占据的矩形区域
             thickness=0,                # 跳转按钮的边框宽度，单位是像素
         )
 
+    def bind_destinations(self):
+        """保存前只为被链接到的页面创建跳转目标，共用的目标写入文档目录的 /Dests"""
+        if self.measure or not (self.link_targets or self.shared_targets):
+            return
+        from reportlab.pdfbase.pdfdoc import PDFDictionary, PDFObjectReference
+        for page_num in self.link_targets | self.shared_targets:
+            if not self.first_page <= page_num <= self.page_num:
+                raise ValueError("链接目标第 %s 页不在文档中" % page_num)
+            dest = self.c._bookmarkReference("p%s" % page_num)
+            dest.fit()
+            dest.setPage(PDFObjectReference("Page%s" % (page_num - self.first_page + 1)))  # reportlab 内部的页面名
+        if self.shared_targets:
+            self.c._doc.Catalog.Dests = PDFDictionary(
+                {"p%s" % page_num: self.c._bookmarkReference("p%s" % page_num) for page_num in self.shared_targets})
+
+    def homelink_rect(self):
+        """【返回目录】按钮的文字起点与链接区域"""
+        text = "返回目录"
+        size = self.content_size
+        x = self.page_width - get_textwidth(text, size, self.widths_normal) - 5
+        y = self.page_height - size - 5
+        return text, x, y, (x, y, x + get_textwidth(text, size, self.widths_normal), y + size)
+
+    def define_homelink(self):
+        """将【返回目录】按钮的文字定义为表单 XObject，每页只需引用一次"""
+        text, x, y, rect = self.homelink_rect()
+        self.c.beginForm("home")
+        t = self.c.beginText(x, y)
+        t.setFont('normal', self.content_size)
+        t.setFillColor((0, 0, 1))
+        t.textOut(text)
+        self.c.drawText(t)
+        self.c.endForm()
+
+    def write_homelink(self, page_num):
+        """写入每页右上角的【返回目录】按钮"""
+        text, x, y, rect = self.homelink_rect()
+        self.draw.do_form("home")
+        self.write_linkbutton(rect, page_num, shared=True)
+
         
         
 
@@ -28,10 +28,25 @@
 
 import sys, os
 import uuid
+import json
+import time
+import shutil
+import hashlib
+from contextlib import nullcontext
 
 import rlab_stage_2 as lab
 
 
+FONT_NORMAL = "sarasa.ttf"                                                      # 默认字体文件
+FONT_BOLD   = "sarasa-bold.ttf"
+LAYOUT_VERSION = 2                                                              # 排版算法版本，改动排版结果时递增以使转换缓存失效
+OUTPUT_VERSION = 2                                                              # 输出格式版本，改动生成的 pdf 时递增以使转换缓存失效
+
+
+class FormatError(Exception):
+    """源文档不符合笔记格式（缩进或对象声明错误），信息中带有出错的行号"""
+
+
 class HashableDict(dict):
     """
     我需要一个可被哈希的字典。
@@ -91,14 +106,13 @@ class Tree():
         self.ptr["#info"].append(content)
         
     def retreat(self, son, times):
-        """返回son对象向上第times代的对象。"""
-        if times > 1:
-            return self.retreat(self.tree[son], times - 1)
-        elif times == 1:
-            self.ptr = self.tree[son]
-        else:
-            raise
-            
+        """将指针移动到son对象向上第times代的对象。"""
+        if times < 1:
+            raise ValueError("回退代数必须大于 0")
+        for _ in range(times):
+            son = self.tree[son]
+        self.ptr = son
+
 
 def get_indent(line):
     """获得当前行的制表符缩进级数"""
@@ -132,14 +146,14 @@ def get_tree(lines):
                     # 暂时允许匿名对象
                     units.create(line[:-1].lstrip("\t"))                                        # 语法树写入新对象
                 else:                                                                       # 当上一个单元未闭合
-                    raise Exception("对象文本内容中不能夹杂对象声明，第 %s 行" % i)                    # 报错
+                    raise FormatError("对象文本内容中不能夹杂对象声明，第 %s 行" % i)                  # 报错
             else:                                                                       # 当 行不以冒号结尾
                 if unit_closed:                                                             # 当上一个单元已闭合。
                     if last_indent == 0:                                                        # 报错
                         # 此处暂时禁止无对象文本的书写。
-                        raise Exception("内容不能位于对象外部，第 %s 行" % i)
+                        raise FormatError("内容不能位于对象外部，第 %s 行" % i)
                     else:                                                                       # 报错
-                        raise Exception(
+                        raise FormatError(
                                     "内容不能与对象位于同一缩进层级，第 %s 行" % i)
                 else:                                                                       # 当上一个单元未闭合（续读内容）
                     units.add_text(line.lstrip("\t"))
@@ -147,7 +161,7 @@ def get_tree(lines):
         elif indent_change == 1:                                                    # 当缩进级数 + 1 ->
             if not unit_closed:                                                         # 当 前一个单元未闭合
                 if line[-1] == "：":                                                         # 当 行以冒号结尾，报错。
-                    raise Exception(
+                    raise FormatError(
                                 "不能在已存在文本的对象内声明新对象，第 %s 行" % i) 
                 else:                                                                       # 当 行不以冒号结尾（写入带缩进的内容行）
                     content_indent += 1                                                         # 记录内容区域的缩进级别+1。（用于与全文档缩进相减得出实际缩进级别变化）
@@ -173,13 +187,196 @@ def get_tree(lines):
             if line[-1] == "：":                                                        # 当该行以冒号结尾（声明新对象）
                 units.create(line[:-1].lstrip("\t"))
             else:                                                                       # 当该行不以冒号结尾，报错
-                raise Exception("内容不能与对象位于同一缩进层级，第 %s 行" % i)
+                raise FormatError("内容不能与对象位于同一缩进层级，第 %s 行" % i)
             
         else:
-            raise Exception("一次缩进级数增长不能大于1，第 %s 行" % i)
+            raise FormatError("一次缩进级数增长不能大于1，第 %s 行" % i)
     return units
         
 
+def iter_events(file):
+    """
+    流式解析：逐行读取文件对象，按与 get_tree 完全相同的缩进与冒号规则产生事件，不构建 Tree。
+    事件为 (类型, 内容, 行索引) 三元组，行索引从 0 开始，与 get_tree 报错信息中的行号一致：
+        ("start", 对象名, i)     声明新对象（进入下一层级）
+        ("text",  内容行, i)     当前对象的一行内容（带缩进的内容行开头带一个制表符）
+        ("end",   None,   i)     退出一层对象（文件结束时补齐所有未退出的层级）
+    与 get_tree 相同，空行（包括文档末尾的空白行）被跳过，文档末尾有无空白行结果都一样。
+    与 get_tree 不同的是，同一对象下的同名子对象会依次产生，而不是后者覆盖前者。
+    占用的内存只与嵌套深度有关，与文件大小无关。
+    """
+    unit_closed    = True                                                       # 上一个对象是否已结束声明
+    last_indent    = 0                                                          # 上一个缩进级数
+    content_indent = 0                                                          # 当前存在于内容区域的缩进级别
+    depth          = 0                                                          # 当前指针所在层级（根为 0）
+    i              = -1
+
+    for i, line in enumerate(file):
+        line = line.rstrip()
+
+        if not line:                                                                # 如果该行为空行，跳过该行。
+            continue
+
+        current_indent = get_indent(line)
+        indent_change  = current_indent - last_indent
+        last_indent    = current_indent
+
+        if indent_change == 0:                                                      # 声明同级对象 或 续读内容
+            if line[-1] == "：":
+                if unit_closed:
+                    depth += 1
+                    yield ("start", line[:-1].lstrip("\t"), i)
+                else:
+                    raise FormatError("对象文本内容中不能夹杂对象声明，第 %s 行" % i)
+            else:
+                if unit_closed:
+                    if last_indent == 0:
+                        raise FormatError("内容不能位于对象外部，第 %s 行" % i)
+                    else:
+                        raise FormatError(
+                                    "内容不能与对象位于同一缩进层级，第 %s 行" % i)
+                else:
+                    yield ("text", line.lstrip("\t"), i)
+
+        elif indent_change == 1:                                                    # 缩进级数 + 1
+            if not unit_closed:
+                if line[-1] == "：":
+                    raise FormatError(
+                                "不能在已存在文本的对象内声明新对象，第 %s 行" % i)
+                else:
+                    content_indent += 1
+                    yield ("text", "\t" + line.lstrip("\t"), i)
+            else:
+                if line[-1] == "：":
+                    depth += 1
+                    yield ("start", line[:-1].lstrip("\t"), i)
+                else:
+                    yield ("text", line.lstrip("\t"), i)
+                    unit_closed = False
+
+        elif indent_change < 0:                                                     # 缩进级数减少
+            diff = indent_change + content_indent
+            if diff < 0:
+                indent_change  = diff
+                content_indent = 0
+            else:
+                content_indent += indent_change
+                continue
+
+            if -indent_change > depth:
+                raise FormatError("缩进回退超出对象层级，第 %s 行" % i)
+            for _ in range(-indent_change):                                         # 回退与缩进层数减少量相同数量个级别
+                yield ("end", None, i)
+            depth -= -indent_change
+            unit_closed = True
+            if line[-1] == "：":
+                depth += 1
+                yield ("start", line[:-1].lstrip("\t"), i)
+            else:
+                raise FormatError("内容不能与对象位于同一缩进层级，第 %s 行" % i)
+
+        else:
+            raise FormatError("一次缩进级数增长不能大于1，第 %s 行" % i)
+
+    for _ in range(depth):                                                      # 文件结束，退出所有层级
+        yield ("end", None, i + 1)
+
+
+MAX_LEVEL = 3                                                                   # pdf 中能显示的标题层级数，更深的对象标题不会被写入
+
+
+def iter_problems(file):
+    """
+    校验：逐行读取文件对象，按与 iter_events 相同的规则检查结构，不构建 Tree，也不在第一个错误处停止。
+    每个问题产生 (行索引, 严重程度, 信息)，行索引从 0 开始（与 iter_events 报错中的行号一致），
+    严重程度为 "error"（iter_events 会报错的结构错误）或 "warning"（能转换但内容会丢失）。
+    出错的行被跳过，之后的行按出错之前的状态继续检查；一次缩进过深的整块内容只报告第一行。
+    """
+    unit_closed    = True
+    last_indent    = 0
+    content_indent = 0
+    depth          = 0
+    skip_deeper    = None                                                       # 缩进跳级之后，比该级数更深的行一并跳过
+
+    for i, line in enumerate(file):
+        line = line.rstrip()
+        if not line:
+            continue
+
+        current_indent = get_indent(line)
+        if skip_deeper is not None:
+            if current_indent > skip_deeper:
+                continue
+            skip_deeper = None
+        indent_change = current_indent - last_indent
+        declare       = line[-1] == "："
+
+        if indent_change > 1:
+            yield (i, "error", "一次缩进级数增长不能大于1")
+            skip_deeper = last_indent + 1
+            continue
+        last_indent = current_indent
+
+        if indent_change == 0:
+            if declare and not unit_closed:
+                yield (i, "error", "对象文本内容中不能夹杂对象声明")
+            elif declare:
+                depth += 1
+                if depth == MAX_LEVEL + 1:
+                    yield (i, "warning", "对象嵌套超过 %s 层，该标题不会写入 pdf" % MAX_LEVEL)
+            elif unit_closed:
+                if current_indent == 0:
+                    yield (i, "error", "内容不能位于对象外部")
+                else:
+                    yield (i, "error", "内容不能与对象位于同一缩进层级")
+
+        elif indent_change == 1:
+            if not unit_closed:
+                content_indent += 1
+                if declare:
+                    yield (i, "error", "不能在已存在文本的对象内声明新对象")
+            elif declare:
+                depth += 1
+                if depth == MAX_LEVEL + 1:
+                    yield (i, "warning", "对象嵌套超过 %s 层，该标题不会写入 pdf" % MAX_LEVEL)
+            else:
+                unit_closed = False
+
+        else:
+            diff = indent_change + content_indent
+            if diff < 0:
+                indent_change  = diff
+                content_indent = 0
+            else:
+                content_indent += indent_change
+                continue
+
+            if -indent_change > depth:
+                yield (i, "error", "缩进回退超出对象层级")
+                indent_change = -depth
+            depth      += indent_change
+            unit_closed = True
+            if declare:
+                depth += 1
+                if depth == MAX_LEVEL + 1:
+                    yield (i, "warning", "对象嵌套超过 %s 层，该标题不会写入 pdf" % MAX_LEVEL)
+            else:
+                yield (i, "error", "内容不能与对象位于同一缩进层级")
+
+
+def iter_pdf_content(events):
+    """将 iter_events 产生的事件流转换为与 decode_tree_to_pdf 相同格式的 (类型, 文本) 条目"""
+    level = 0
+    for kind, value, i in events:
+        if kind == "start":
+            level += 1
+            yield (f"h{level}", value)
+        elif kind == "text":
+            yield ("content", value)
+        else:
+            level -= 1
+
+
 def dec(data, file, indent=0):
     for k, v in data.items():
         if k == '#info':
@@ -195,7 +392,10 @@ def dec(data, file, indent=0):
     # print("========写入完成！========")
 
 
-def decode_tree_to_pdf(data, level=1, result=[]):
+def decode_tree_to_pdf(data, level=1, result=None):
+    # 不使用可变默认参数，否则多次调用（同一进程中的多次转换）的结果会不断累积
+    if result is None:
+        result = []
     for k, v in data.items():
         if k == '#info':
             for line in v:
@@ -208,136 +408,576 @@ def decode_tree_to_pdf(data, level=1, result=[]):
 
 # =================================================================
 
-def main(arg, file_num):
-    with open(arg, 'r', encoding='utf-8-sig') as file:
-        lines = file.readlines()                                                     
-    units = get_tree(lines)
-    
-    pdf_content = decode_tree_to_pdf(units.data)
-
-    # -----------------------------------------------------------
-    # 存在内存泄漏问题，暂时还没解决。请找到办法在函数结尾释放以下三个对象的内存。
-    # 临时解决方案是用计数器不断增加临时pdf文件名的数字，应该会修复功能，但是不解决内存泄露
-    # 发现内存泄漏问题至少不是仅存在于临时pdf文件中，主pdf对象也存在内存泄露。
-    pdf1 = lab.PDF(f"{file_num + 1}.pdf", "sarasa.ttf", "sarasa-bold.ttf")
-    pdf2 = lab.PDF(f"{file_num + 2}.pdf", "sarasa.ttf", "sarasa-bold.ttf")
-    pdf = lab.PDF(arg, "sarasa.ttf", "sarasa-bold.ttf")
-
-    # ----------pdf1-----------
-
-    pdf1.write_doctitle()
+def write_body(pdf, pdf_content, color=True, content_lines=None, progress=None):
+    """
+    将扁平化后的文档内容写入 pdf 对象（测量与正式渲染共用同一套写入流程）。
+    color=False 时使用无底色的标题，两者占用的排版空间完全相同。
+    content_lines 为按顺序对应每个正文条目的已分好的行列表（见 PDF.split_contents）。
+    progress 为进度回调，每写入一个一级标题调用一次 progress("rendering", {...})。
+    """
+    if content_lines is not None:
+        content_lines = iter(content_lines)
 
     for item in pdf_content:
         if item[0] == "content":
-            pdf1.write_content(item[1])
+            if content_lines is None:
+                pdf.write_content(item[1])
+            else:
+                pdf.write_content(item[1], next(content_lines))
         if item[0] == "h1":
-            pdf1.write_h1(item[1])
+            if progress is not None:
+                progress("rendering", {"heading": item[1], "page": pdf.page_num})
+            pdf.write_h1(item[1])
         if item[0] == "h2":
-            pdf1.write_h2(item[1])
+            if color:
+                pdf.write_h2color(item[1])
+            else:
+                pdf.write_h2(item[1])
         if item[0] == "h3":
-            pdf1.write_h3(item[1])
-    
-    # ----------pdf2-----------
+            if color:
+                pdf.write_h3color(item[1])
+            else:
+                pdf.write_h3(item[1])
 
-    pdf2.write_doctitle()
-    pdf2.write_catalog(pdf1)
 
-    catalog_page_num = pdf2.page_num - 1
-    
-    # ----------pdf-----------
+def split_chapters(pdf_content):
+    """按一级标题将扁平化的文档内容切分为章节，每章以其 h1 条目开头"""
+    chapters = []
+    for item in pdf_content:
+        if item[0] == "h1" or not chapters:
+            chapters.append([])
+        chapters[-1].append(item)
+    return chapters
 
-    pdf.write_doctitle()
-    pdf.write_catalog(pdf1, catalog_page_num)
 
-    # ----
-    
-    for item in pdf_content:
-        if item[0] == "content":
-            pdf.write_content(item[1])
-        if item[0] == "h1":
-            pdf.write_h1(item[1])
-        if item[0] == "h2":
-            pdf.write_h2color(item[1])
-        if item[0] == "h3":
-            pdf.write_h3color(item[1])
+class ConversionCache():
+    """
+    内容寻址的转换缓存。
+    以源文件内容与文件名（封面标题）、字体文件、页面尺寸、影响输出的选项以及程序与 reportlab 版本的哈希为键，
+    在 cache_dir 中保存生成的 pdf。命中时直接复制保存的 pdf，不解析也不渲染（不导入 reportlab）。
+    经由缓存的转换总以确定性模式生成，相同输入得到相同字节。
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits      = 0
+        self.misses    = 0
+
+    def key(self, arg, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, page_size=None, **options):
+        """源文件与影响输出的全部参数共同决定的键（options 为 compression、catalog 等转换选项）"""
+        import reportlab                                                        # 只取版本号，不会加载 reportlab 的其余部分
+        digest = hashlib.sha256()
+        with open(arg, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        data = json.dumps([
+            LAYOUT_VERSION, OUTPUT_VERSION, reportlab.Version,
+            lab.get_barefilename(arg), digest.hexdigest(),
+            lab.WidthTable.load(font_normal).digest, lab.WidthTable.load(font_bold).digest,
+            list(page_size) if page_size else "A4",
+            sorted(options.items()),
+        ], ensure_ascii=False)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key, output):
+        """命中时把保存的 pdf 复制到 output，返回其信息 {"pages", "bytes"}；未命中返回 None"""
+        path = os.path.join(self.cache_dir, key + ".pdf")
+        try:
+            with open(path + ".json", encoding="utf-8") as file:
+                info = json.load(file)
+            directory = os.path.dirname(output)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            shutil.copyfile(path, output)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return info
+
+    def put(self, key, output, info):
+        """保存生成的 pdf 及其信息（先写 pdf 再写信息文件，信息文件存在即表示条目完整）"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path     = os.path.join(self.cache_dir, key + ".pdf")
+        tmp_path = "%s.%s.tmp" % (path, os.getpid())
+        shutil.copyfile(output, tmp_path)
+        os.replace(tmp_path, path)
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(info, file)
+        os.replace(tmp_path, path + ".json")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "hit_rate": self.hits / total if total else 1.0,
+        }
+
+
+class ChapterCache():
+    """
+    章节缓存：在 cache_dir 中保存每章渲染好的页面内容（见 lab.PDF.begin_chapter），
+    再次转换改动过的文档时，未改动的章节既不排版也不渲染，直接写入保存的内容。
+    页面内容中的文字以字体子集中的编码表示，而编码按字符在文档中首次出现的顺序分配。
+    因此每篇文档另存一份字体编码状态（各字体已分配编码的字符），转换时先按它分配编码；
+    保存的章节只有在其用到的编码与当前文档一致时才会重放，否则照常渲染。
+    编码状态只增不减，不再出现于文档中的字符仍会嵌入字体子集，这类字符过多时丢弃状态重新开始。
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir  = cache_dir
+        self.hits       = 0
+        self.misses     = 0
+        self.last_build = None                                                  # 最近一次转换的 {"chapters", "hits", "misses", "hit_rate"}
+
+    def document_key(self, arg, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, page_size=None, **options):
+        """文档（路径）与影响页面内容的全部参数共同决定的键"""
+        import reportlab
+        data = json.dumps([
+            LAYOUT_VERSION, OUTPUT_VERSION, reportlab.Version, os.path.abspath(arg),
+            lab.WidthTable.load(font_normal).digest, lab.WidthTable.load(font_bold).digest,
+            list(page_size) if page_size else "A4",
+            sorted(options.items()),
+        ], ensure_ascii=False)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def chapter_key(self, document_key, chapter):
+        data = json.dumps([document_key, chapter], ensure_ascii=False)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def load(self, key):
+        try:
+            with open(os.path.join(self.cache_dir, key + ".json"), encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path     = os.path.join(self.cache_dir, key + ".json")
+        tmp_path = "%s.%s.tmp" % (path, os.getpid())
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get(self, document_key, chapter):
+        """章节的 {"pages", "headings", "render"}，没有保存时返回 None"""
+        return self.load(self.chapter_key(document_key, chapter))
+
+    def put(self, document_key, chapter, entry):
+        self.store(self.chapter_key(document_key, chapter), entry)
+
+    def font_codes(self, document_key, chars):
+        """
+        文档的字体编码状态（见 lab.PDF.font_codes），没有时返回 {}。
+        chars 为本次转换的文档用到的字符；状态中没有用到的非 ASCII 字符超过 64 个与其总数的 10% 时丢弃状态。
+        """
+        codes = self.load(document_key) or {}
+        wide  = [char for text in codes.values() for char in text if ord(char) > 127]
+        stale = sum(1 for char in wide if char not in chars)
+        if stale > max(64, len(wide) // 10):
+            return {}
+        return codes
+
+    def put_font_codes(self, document_key, codes):
+        self.store(document_key, codes)
+
+    def record(self, hits, misses):
+        """记录一次转换中可缓存章节的命中数与未命中数"""
+        self.hits   += hits
+        self.misses += misses
+        total = hits + misses
+        self.last_build = {"chapters": total, "hits": hits, "misses": misses,
+                           "hit_rate": hits / total if total else 1.0}
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "hit_rate": self.hits / total if total else 1.0,
+        }
+
+
+def layout_chapters(arg, chapters, vectorize=True, font_normal=FONT_NORMAL, font_bold=FONT_BOLD):
+    """
+    逐章排版（只测量），每章从新的一页开始。
+    返回每章的 {"pages": 所占页数, "headings": 标题索引（章内相对页码）, "content_lines": 分好的正文行}
+    """
+    probe = lab.PDF(arg, font_normal, font_bold, measure=True)
 
-    pdf.save()
+    # 各章的正文一起分行
+    texts = [item[1] for chapter in chapters for item in chapter if item[0] == "content"]
+    lines = iter(probe.split_contents(texts, vectorize))
 
-    pdf_file_name = pdf.file_name
+    results = []
+    for chapter in chapters:
+        content_lines = [next(lines) for item in chapter if item[0] == "content"]
 
-    # 内存清理，目前看来没用
-    del pdf1
-    del pdf2
-    del pdf
+        pdf = lab.PDF(arg, font_normal, font_bold, measure=True)                # 从新的一页开始排版本章
+        write_body(pdf, chapter, color=False, content_lines=content_lines)
+        results.append({
+            "pages":         pdf.page_num,
+            "headings":      pdf.heading_table,
+            "content_lines": content_lines,
+        })
+    return results
 
-    return pdf_file_name
 
+def layout(arg, pdf_content, vectorize=True, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, catalog=True):
+    """
+    只测量的排版：不创建画布，计算正文各标题所在页码与目录所占页数。
+    catalog=False 时不测量目录（目录页数为 0）。
+    返回 (heading_table, catalog_page_num, content_lines)，heading_table 为 lab.HeadingIndex
+    """
+    body = lab.PDF(arg, font_normal, font_bold, measure=True)
 
-# ======================================================================
+    # 整篇文档的正文一次性分行，测量与正式渲染共用
+    content_lines = body.split_contents(
+        [item[1] for item in pdf_content if item[0] == "content"], vectorize)
 
-if __name__ == "__main__":
-    
-    # arg = sys.argv[1]
-    arg = '门店认领文档.txt'
-    with open(arg, 'r', encoding='utf-8-sig') as file:
-        lines = file.readlines()                                                     
-    units = get_tree(lines)
-    
-    pdf_content = decode_tree_to_pdf(units.data)
+    # 正文排版，得出各标题的页码（以封面为第 1 页）
+    body.write_doctitle()
+    write_body(body, pdf_content, color=False, content_lines=content_lines)
+    heading_table = body.heading_table
 
+    if not catalog:
+        return heading_table, 0, content_lines
+    return heading_table, measure_catalog(arg, heading_table, font_normal, font_bold), content_lines
 
-    # -----------------------------------------------------------
-    pdf1 = lab.PDF("1.pdf", "sarasa.ttf", "sarasa-bold.ttf")
-    pdf2 = lab.PDF("2.pdf", "sarasa.ttf", "sarasa-bold.ttf")
-    pdf = lab.PDF(arg, "sarasa.ttf", "sarasa-bold.ttf")
 
-    # ----------pdf1-----------
+def measure_catalog(arg, heading_table, font_normal=FONT_NORMAL, font_bold=FONT_BOLD):
+    """目录排版，得出目录页数（目录每行长度固定，与页码偏移量无关）"""
+    catalog = lab.PDF(arg, font_normal, font_bold, measure=True)
+    catalog.write_doctitle()
+    catalog.write_catalog(heading_table)
+    return catalog.page_num - 1
 
-    pdf1.write_doctitle()
 
-    for item in pdf_content:
-        if item[0] == "content":
-            pdf1.write_content(item[1])
-        if item[0] == "h1":
-            pdf1.write_h1(item[1])
-        if item[0] == "h2":
-            pdf1.write_h2(item[1])
-        if item[0] == "h3":
-            pdf1.write_h3(item[1])
-    
-    # ----------pdf2-----------
+def layout_stream(arg, pdf_content, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, catalog=True):
+    """
+    流式排版测量：逐条消费 pdf_content（可以是生成器），每段正文分行后即丢弃，
+    只保留标题索引。返回 (heading_table, catalog_page_num)
+    """
+    body = lab.PDF(arg, font_normal, font_bold, measure=True)
+    body.write_doctitle()
+    write_body(body, pdf_content, color=False)
+    if not catalog:
+        return body.heading_table, 0
+    return body.heading_table, measure_catalog(arg, body.heading_table, font_normal, font_bold)
+
+
+class TimedFile():
+    """逐行读取文件，并把读取耗时累加到 instrument 的 "read" 阶段"""
+    def __init__(self, file, instrument):
+        self.file       = file
+        self.instrument = instrument
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        wall = time.perf_counter()
+        cpu  = time.process_time()
+        try:
+            return next(self.file)
+        finally:
+            self.instrument.add_time("read", time.perf_counter() - wall, time.process_time() - cpu)
+
+
+def main(arg, file_num=0, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, output=None, progress=None,
+         instrument=None, stream=False, compression=None, catalog=True, deterministic=False, pdf_cache=None,
+         chapter_cache=None):
+    """
+    转换 arg 所指的 txt 文档，返回生成的 pdf 文件路径。
+    output 为输出文件路径，默认与源文件同名同目录。
+    progress 为进度回调 progress(阶段, 信息字典)，依次收到
+    "parsed"、"laid_out"、"catalog"、若干次 "rendering"、"saved"（附带输出文件字节数 bytes）。
+    回调中抛出的异常会中止转换（不会生成文件），可用于取消。
+    instrument 为 lab.Instrument 时记录各阶段（read、parse、flatten、layout、catalog、render、save）
+    的墙钟与 CPU 时间，以及页数、绘制行数、链接数、标题数、字体占用内存与输出字节数。
+    stream=True 时为低内存模式：测量与渲染各自重新流式读取源文件，
+    Python 侧只保留标题表与当前段落，每页的内容流写完即暂存到磁盘（见 lab.PageSpool）
+    （解析耗时计入 layout 与 render）。
+    compression 为输出压缩模式 "none" / "fast" / "max"（见 lab.COMPRESSION），默认沿用 reportlab 的设置。
+    生成的 pdf 总是带有文档大纲（书签）；catalog=False 时不生成目录页，只靠大纲导航。
+    deterministic=True 时输出与生成时间无关（见 lab.PDF），相同输入得到相同字节。
+    pdf_cache 为 ConversionCache 时先按输入的哈希查找已生成的 pdf，命中则直接复制
+    （只收到一次 "saved"，附带 cached=True）；未命中时以确定性模式生成并存入缓存。
+    chapter_cache 为 ChapterCache 时逐章查找渲染好的页面内容，未改动的章节直接写入
+    （"saved" 附带本次的命中情况 chapter_cache，见 ChapterCache.last_build）。低内存模式不使用章节缓存。
+    """
+    # file_num 曾用于区分临时 pdf 文件名，现已不再需要，保留该参数以兼容旧调用方。
+    if progress is None:
+        progress = lambda stage, info: None
+
+    if pdf_cache is not None:
+        key    = pdf_cache.key(arg, font_normal, font_bold, compression=compression, catalog=catalog)
+        output = output or lab.cut_extname(arg) + ".pdf"
+        info   = pdf_cache.get(key, output)
+        if info is not None:
+            progress("saved", dict(info, file=output, cached=True))
+            if instrument is not None:
+                instrument.count("pdf_cache_hits")
+            return output
+
+        saved = {}
+        def relay(stage, info):
+            if stage == "saved":
+                saved.update(pages=info["pages"], bytes=info["bytes"])
+            progress(stage, info)
+        output = main(arg, file_num, font_normal, font_bold, output, relay, instrument, stream,
+                      compression, catalog, deterministic=True, chapter_cache=chapter_cache)
+        pdf_cache.put(key, output, saved)
+        return output
+
+    if stream:
+        return main_stream(arg, font_normal, font_bold, output, progress, instrument, compression, catalog,
+                           deterministic)
+
+    stage = nullcontext if instrument is None else instrument.stage
 
-    pdf2.write_doctitle()
-    pdf2.write_catalog(pdf1)
+    with open(arg, 'r', encoding='utf-8-sig') as file:
+        if instrument is None:
+            pdf_content = list(iter_pdf_content(iter_events(file)))
+        else:
+            # 分开计时：读取、解析、扁平化（解析阶段的耗时不含读取）
+            with stage("parse"):
+                events = list(iter_events(TimedFile(file, instrument)))
+            read = instrument.stages.get("read", {"wall": 0.0, "cpu": 0.0})
+            instrument.add_time("parse", -read["wall"], -read["cpu"])
+            with stage("flatten"):
+                pdf_content = list(iter_pdf_content(events))
+            del events
+    progress("parsed", {"items": len(pdf_content)})
+
+    if chapter_cache is not None:
+        return main_chapters(arg, pdf_content, chapter_cache, font_normal, font_bold, output, progress,
+                             instrument, compression, catalog, deterministic)
+
+    # ----------测量-----------
+
+    with stage("layout"):
+        heading_table, catalog_page_num, content_lines = layout(
+            arg, pdf_content, font_normal=font_normal, font_bold=font_bold, catalog=catalog)
+    progress("laid_out", {"headings": len(heading_table), "catalog_pages": catalog_page_num})
 
-    catalog_page_num = pdf2.page_num - 1
-    
     # ----------pdf-----------
 
-    pdf.write_doctitle()
-    pdf.write_catalog(pdf1, catalog_page_num)
+    with stage("catalog"):
+        pdf = lab.PDF(arg, font_normal, font_bold, output=output, instrument=instrument,
+                      compression=compression, catalog=catalog, deterministic=deterministic)
 
-    # ----
+        pdf.write_doctitle()
+        if catalog:
+            pdf.write_catalog(heading_table, catalog_page_num)
+    progress("catalog", {"page": pdf.page_num})
 
-    for item in pdf_content:
-        if item[0] == "content":
-            pdf.write_content(item[1])
-        if item[0] == "h1":
-            pdf.write_h1(item[1])
-        if item[0] == "h2":
-            pdf.write_h2color(item[1])
-        if item[0] == "h3":
-            pdf.write_h3color(item[1])
+    with stage("render"):
+        write_body(pdf, pdf_content, content_lines=content_lines, progress=progress)
 
-    pdf.save()
-    print("========生成完毕！========")
+    with stage("save"):
+        pdf.save()
+    output_bytes = os.path.getsize(pdf.file_name)
+    progress("saved", {"file": pdf.file_name, "pages": pdf.page_num, "bytes": output_bytes})
+
+    if instrument is not None:
+        instrument.count("pages", pdf.page_num)
+        instrument.count("headings", len(heading_table))
+        instrument.count("font_memory_bytes", lab.font_cache.stats()["memory_bytes"])
+        instrument.count("output_bytes", output_bytes)
+
+    return pdf.file_name
 
 
+def main_chapters(arg, pdf_content, chapter_cache, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, output=None,
+                  progress=None, instrument=None, compression=None, catalog=True, deterministic=False):
+    """
+    使用章节缓存转换已解析的文档（见 main 的 chapter_cache 参数），生成的 pdf 与不使用缓存时相同。
+    以一级标题开头的每章为一个缓存单位，第一个一级标题之前的内容总是重新渲染。
+    """
+    if progress is None:
+        progress = lambda stage, info: None
+    stage = nullcontext if instrument is None else instrument.stage
+
+    document = chapter_cache.document_key(arg, font_normal, font_bold, catalog=catalog)
+    chapters = split_chapters(pdf_content)
+
+    # ----------测量（只排版未缓存的章节）-----------
+
+    with stage("layout"):
+        entries = [chapter_cache.get(document, chapter) if chapter[0][0] == "h1" else None
+                   for chapter in chapters]
+        missing = [n for n, entry in enumerate(entries) if entry is None]
+        results = dict(zip(missing, layout_chapters(arg, [chapters[n] for n in missing],
+                                                    font_normal=font_normal, font_bold=font_bold)))
+        for n, entry in enumerate(entries):
+            if entry is not None:
+                results[n] = {"pages": entry["pages"], "headings": lab.HeadingIndex.from_rows(entry["headings"]),
+                              "content_lines": None}
+
+        heading_table = lab.HeadingIndex()
+        start_page    = 2
+        for n in range(len(chapters)):
+            heading_table.extend(results[n]["headings"], start_page - 1)
+            start_page += results[n]["pages"]
+        catalog_page_num = measure_catalog(arg, heading_table, font_normal, font_bold) if catalog else 0
+    progress("laid_out", {"headings": len(heading_table), "catalog_pages": catalog_page_num})
 
+    # ----------pdf-----------
 
+    with stage("catalog"):
+        pdf = lab.PDF(arg, font_normal, font_bold, output=output, instrument=instrument,
+                      compression=compression, catalog=catalog, deterministic=deterministic)
+
+        chars = set(pdf.pdf_name).union(*(item[1] for item in pdf_content))
+        pdf.seed_fonts(chapter_cache.font_codes(document, chars))              # 沿用上次转换的字形编码
+        pdf.write_doctitle()
+        if catalog:
+            pdf.write_catalog(heading_table, catalog_page_num)
+    progress("catalog", {"page": pdf.page_num})
+
+    hits = misses = 0
+    with stage("render"):
+        for n, chapter in enumerate(chapters):
+            result = results[n]
+            if chapter[0][0] != "h1":
+                write_body(pdf, chapter, content_lines=result["content_lines"], progress=progress)
+                continue
+
+            progress("rendering", {"heading": chapter[0][1], "page": pdf.page_num})
+            pdf.begin_chapter()
+            entry = entries[n]
+            if entry is not None and pdf.can_replay(entry["render"], pdf.font_codes()):
+                pdf.replay_chapter(entry["render"], result["headings"])
+                hits += 1
+                continue
+
+            write_body(pdf, chapter, content_lines=result["content_lines"])
+            chapter_cache.put(document, chapter, {
+                "pages":    result["pages"],
+                "headings": result["headings"].rows(),
+                "render":   pdf.end_chapter(),
+            })
+            misses += 1
+    chapter_cache.record(hits, misses)
+
+    with stage("save"):
+        chapter_cache.put_font_codes(document, pdf.font_codes())
+        pdf.save()
+    output_bytes = os.path.getsize(pdf.file_name)
+    progress("saved", {"file": pdf.file_name, "pages": pdf.page_num, "bytes": output_bytes,
+                       "chapter_cache": chapter_cache.last_build})
+
+    if instrument is not None:
+        instrument.count("pages", pdf.page_num)
+        instrument.count("headings", len(heading_table))
+        instrument.count("chapter_cache_hits", hits)
+        instrument.count("chapter_cache_misses", misses)
+        instrument.count("font_memory_bytes", lab.font_cache.stats()["memory_bytes"])
+        instrument.count("output_bytes", output_bytes)
+
+    return pdf.file_name
+
+
+def main_stream(arg, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, output=None, progress=None, instrument=None,
+                compression=None, catalog=True, deterministic=False):
+    """低内存模式的转换（见 main 的 stream 参数）"""
+    if progress is None:
+        progress = lambda stage, info: None
+    stage = nullcontext if instrument is None else instrument.stage
+
+    # ----------测量（第一遍读取）-----------
+
+    with stage("layout"):
+        with open(arg, 'r', encoding='utf-8-sig') as file:
+            heading_table, catalog_page_num = layout_stream(
+                arg, iter_pdf_content(iter_events(file)), font_normal, font_bold, catalog)
+    progress("laid_out", {"headings": len(heading_table), "catalog_pages": catalog_page_num})
+
+    # ----------pdf（第二遍读取）-----------
+
+    with stage("catalog"):
+        pdf = lab.PDF(arg, font_normal, font_bold, output=output, instrument=instrument,
+                      compression=compression, catalog=catalog, deterministic=deterministic, spool=True)
+        pdf.write_doctitle()
+        if catalog:
+            pdf.write_catalog(heading_table, catalog_page_num)
+    progress("catalog", {"page": pdf.page_num})
+
+    with stage("render"):
+        with open(arg, 'r', encoding='utf-8-sig') as file:
+            write_body(pdf, iter_pdf_content(iter_events(file)), progress=progress)
+
+    with stage("save"):
+        pdf.save()
+    output_bytes = os.path.getsize(pdf.file_name)
+    progress("saved", {"file": pdf.file_name, "pages": pdf.page_num, "bytes": output_bytes})
+
+    if instrument is not None:
+        instrument.count("pages", pdf.page_num)
+        instrument.count("headings", len(heading_table))
+        instrument.count("font_memory_bytes", lab.font_cache.stats()["memory_bytes"])
+        instrument.count("output_bytes", output_bytes)
+
+    return pdf.file_name
+
+
+def main_bundle(paths, output, font_normal=FONT_NORMAL, font_bold=FONT_BOLD, title=None, progress=None,
+                compression=None, catalog=True, deterministic=False):
+    """
+    合集模式：将多个 txt 文档写入同一个 pdf，返回生成的 pdf 文件路径。
+    封面之后是合并的目录，随后每篇文档依次作为一节（标题页 + 正文），在大纲中各占一个顶层条目。
+    整个合集只用一个画布，字体只注册与嵌入一次；所有文档的正文一起分行。
+    title 为封面标题，默认取 output 的文件名。progress 的阶段与 main 相同，"parsed" 附带文档数 documents。
+    """
+    if progress is None:
+        progress = lambda stage, info: None
+    title = title or lab.get_barefilename(output)
+
+    documents = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8-sig') as file:
+            documents.append((lab.get_barefilename(path), list(iter_pdf_content(iter_events(file)))))
+    progress("parsed", {"documents": len(documents), "items": sum(len(content) for _, content in documents)})
+
+    # ----------测量-----------
+
+    body = lab.PDF(output, font_normal, font_bold, measure=True)
+    content_lines = body.split_contents(
+        [item[1] for _, content in documents for item in content if item[0] == "content"])
+    lines = iter(content_lines)
+    body.write_doctitle(title)
+    for name, content in documents:
+        body.write_section(name)
+        write_body(body, content, color=False, content_lines=lines)
+    heading_table    = body.heading_table
+    catalog_page_num = measure_catalog(output, heading_table, font_normal, font_bold) if catalog else 0
+    progress("laid_out", {"headings": len(heading_table), "catalog_pages": catalog_page_num})
 
+    # ----------pdf-----------
 
+    pdf = lab.PDF(output, font_normal, font_bold, output=output, compression=compression, catalog=catalog,
+                  deterministic=deterministic)
+    pdf.write_doctitle(title)
+    if catalog:
+        pdf.write_catalog(heading_table, catalog_page_num)
+    progress("catalog", {"page": pdf.page_num})
 
+    lines = iter(content_lines)
+    for name, content in documents:
+        pdf.write_section(name)
+        write_body(pdf, content, content_lines=lines, progress=progress)
 
+    pdf.save()
+    output_bytes = os.path.getsize(pdf.file_name)
+    progress("saved", {"file": pdf.file_name, "pages": pdf.page_num, "bytes": output_bytes})
+    return pdf.file_name
 
+# ======================================================================
+
+if __name__ == "__main__":
     
+    # arg = sys.argv[1]
+    arg = '门店认领文档.txt'
+    main(arg)
+    print("========生成完毕！========")
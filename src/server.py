@@ -0,0 +1,321 @@
+"""
+本机 HTTP 转换服务（仅依赖标准库 asyncio）。
+
+    python server.py --port 8765 -j 4 --queue 32 --timeout 60
+
+    POST /convert?name=笔记      请求体为 UTF-8 编码的笔记文本，返回生成的 pdf
+    GET  /metrics                 JSON 格式的请求计数、延迟分位数与吞吐量
+    GET  /health                  存活检查
+
+转换在预热的工作进程池中执行（每个进程启动时加载一次字体）。
+笔记格式错误时返回 400 及出错的行号（name 中含有路径分隔符、控制字符等无效字符时同样返回 400），
+转换过程中的其他异常返回 500。
+排队与执行中的转换总数超过 工作进程数 + 队列长度 时新的请求立即得到 429，
+单个请求超过 --timeout 秒未完成时返回 504（已开始执行的转换无法中断，
+会在后台跑完并继续占用名额，直到真正结束）。
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+import rlab_stage_2 as lab
+import rlab_stage_3 as main
+import batch
+
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+    504: "Gateway Timeout",
+}
+CHUNK_SIZE = 64 * 1024                                                          # 回传 pdf 时每次写出的字节数
+NAME_INVALID = set('/\\:*?"<>|')                                                # 不能出现在名称（临时文件名）中的字符，另有控制字符
+NAME_MAX_BYTES = 200                                                            # 名称的最大 UTF-8 字节数（文件名一般不超过 255 字节）
+
+
+def convert_text(text, name, font_normal, font_bold, compression=None):
+    """在工作进程中转换一篇笔记文本，返回 pdf 的字节内容"""
+    with tempfile.TemporaryDirectory(prefix="txt2pdf-") as folder:
+        source = os.path.join(folder, name + ".txt")                            # 文件名即 pdf 封面上的标题
+        with open(source, "w", encoding="utf-8") as file:
+            file.write(text)
+        output = main.main(source, font_normal=font_normal, font_bold=font_bold, compression=compression)
+        with open(output, "rb") as file:
+            return file.read()
+
+
+def check_name(name):
+    """检查 pdf 封面标题（同时用作工作进程中的临时文件名），可用时返回 None，否则返回原因"""
+    if name in (".", ".."):
+        return "无效的名称：%r" % name
+    if len(name.encode("utf-8", "surrogatepass")) > NAME_MAX_BYTES:
+        return "名称过长（最多 %s 字节）" % NAME_MAX_BYTES
+    for char in name:
+        if char in NAME_INVALID or ord(char) < 0x20 or ord(char) == 0x7F:
+            return "名称中含有无效字符：%r" % char
+    return None
+
+
+def ping():
+    """预热用的空任务"""
+    return os.getpid()
+
+
+class Metrics():
+    """请求计数、最近若干次转换的延迟与最近一分钟的吞吐量"""
+    def __init__(self):
+        self.started   = time.monotonic()
+        self.counts    = {"requests": 0, "ok": 0, "rejected": 0, "timeouts": 0, "failed": 0, "bad_requests": 0}
+        self.latencies = deque(maxlen=1000)                                     # 最近若干次成功转换的耗时
+        self.finished  = deque()                                                # 最近一分钟内成功转换的完成时刻
+        self.bytes     = 0                                                      # 回传的 pdf 总字节数
+
+    def count(self, name):
+        self.counts[name] += 1
+
+    def record(self, seconds, size, now=None):
+        now = time.monotonic() if now is None else now
+        self.counts["ok"] += 1
+        self.bytes += size
+        self.latencies.append(seconds)
+        self.finished.append(now)
+
+    def report(self, pending=0, capacity=0, now=None):
+        now = time.monotonic() if now is None else now
+        while self.finished and now - self.finished[0] > 60:
+            self.finished.popleft()
+        latencies = sorted(self.latencies)
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        uptime = now - self.started
+        return {
+            "uptime":   round(uptime, 3),
+            "counts":   dict(self.counts),
+            "pending":  pending,
+            "capacity": capacity,
+            "bytes":    self.bytes,
+            "latency": {
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "p50":  percentile(0.5),
+                "p90":  percentile(0.9),
+                "p99":  percentile(0.99),
+                "max":  latencies[-1] if latencies else None,
+            },
+            "throughput": {
+                "last_minute": len(self.finished),                              # 最近一分钟完成的转换数
+                "per_minute":  self.counts["ok"] / uptime * 60 if uptime > 0 else 0.0,
+            },
+        }
+
+
+class ConversionServer():
+    """asyncio HTTP 服务：解析请求，把转换交给进程池，并控制排队长度与超时"""
+    def __init__(self, workers=None, queue_size=32, timeout=60.0, max_body=16 * 1024 * 1024,
+                 font_normal=main.FONT_NORMAL, font_bold=main.FONT_BOLD, compression=None):
+        self.workers     = workers or os.cpu_count()
+        self.capacity    = self.workers + queue_size                            # 排队与执行中的转换总数上限
+        self.timeout     = timeout
+        self.max_body    = max_body
+        self.font_normal = os.path.abspath(font_normal)
+        self.font_bold   = os.path.abspath(font_bold)
+        self.compression = compression
+
+        self.pending = 0                                                        # 已提交、尚未结束的转换数
+        self.metrics = Metrics()
+        self.pool    = ProcessPoolExecutor(max_workers=self.workers, initializer=batch.warm_fonts,
+                                           initargs=(self.font_normal, self.font_bold))
+
+    def warm_up(self):
+        """启动全部工作进程并等待其加载完字体"""
+        futures = [self.pool.submit(ping) for _ in range(self.workers)]
+        return {future.result() for future in futures}
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    # ---------- 转换 ----------
+
+    def release(self, future):
+        self.pending -= 1
+
+    async def convert(self, text, name, compression):
+        """提交转换并等待结果，返回 (状态码, pdf 字节或错误信息)"""
+        if self.pending >= self.capacity:
+            self.metrics.count("rejected")
+            return 429, "队列已满，请稍后重试"
+
+        self.pending += 1
+        start  = time.perf_counter()
+        future = self.pool.submit(convert_text, text, name, self.font_normal, self.font_bold, compression)
+        loop   = asyncio.get_running_loop()
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self.release, f))  # 真正结束（或取消）时才释放名额
+        try:
+            data = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()                                                     # 仍在排队时可以取消
+            self.metrics.count("timeouts")
+            return 504, "转换超时（%s 秒）" % self.timeout
+        except main.FormatError as e:
+            self.metrics.count("bad_requests")                                  # 笔记格式错误是请求方的问题，不计为转换失败
+            return 400, str(e)
+        except Exception as e:
+            self.metrics.count("failed")
+            return 500, "%s: %s" % (type(e).__name__, e)
+        self.metrics.record(time.perf_counter() - start, len(data))
+        return 200, data
+
+    # ---------- HTTP ----------
+
+    async def handle(self, reader, writer):
+        """处理一个连接（支持 keep-alive）"""
+        try:
+            while True:
+                try:
+                    head       = await reader.readuntil(b"\r\n\r\n")
+                    keep_alive = await self.respond(head, reader, writer)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break                                                       # 对方在请求中途断开（包括读取请求体时）
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def respond(self, head, reader, writer):
+        """处理一个请求，返回连接是否保持"""
+        try:
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            method, target, version = request_line.split(" ", 2)
+        except ValueError:
+            await self.send(writer, 400, "请求格式错误", keep_alive=False)
+            return False
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > self.max_body:
+            await self.send(writer, 413 if length > 0 else 400, "请求体过大或长度无效", keep_alive=False)
+            return False
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        self.metrics.count("requests")
+        if url.path == "/health":
+            await self.send(writer, 200, "ok", keep_alive=keep_alive)
+        elif url.path == "/metrics":
+            report = self.metrics.report(self.pending, self.capacity)
+            await self.send(writer, 200, json.dumps(report, ensure_ascii=False, indent=2),
+                            "application/json; charset=utf-8", keep_alive)
+        elif url.path == "/convert":
+            if method != "POST":
+                await self.send(writer, 405, "只接受 POST", keep_alive=keep_alive)
+                return keep_alive
+            await self.respond_convert(url, body, writer, keep_alive)
+        else:
+            await self.send(writer, 404, "未知路径", keep_alive=keep_alive)
+        return keep_alive
+
+    async def respond_convert(self, url, body, writer, keep_alive):
+        query       = parse_qs(url.query)
+        name        = query.get("name", ["note"])[0].strip() or "note"
+        compression = query.get("compression", [self.compression])[0]
+        problem     = check_name(name)
+        if problem is not None:
+            self.metrics.count("bad_requests")
+            await self.send(writer, 400, problem, keep_alive=keep_alive)
+            return
+        if compression is not None and compression not in lab.COMPRESSION:
+            self.metrics.count("bad_requests")
+            await self.send(writer, 400, "未知的压缩模式：%s" % compression, keep_alive=keep_alive)
+            return
+        try:
+            text = body.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            self.metrics.count("bad_requests")
+            await self.send(writer, 400, "请求体必须是 UTF-8 编码的文本", keep_alive=keep_alive)
+            return
+
+        status, result = await self.convert(text, name, compression)
+        if status == 200:
+            await self.send(writer, 200, result, "application/pdf", keep_alive)
+        else:
+            extra = {"Retry-After": "1"} if status == 429 else {}
+            await self.send(writer, status, result, keep_alive=keep_alive, headers=extra)
+
+    async def send(self, writer, status, body, content_type="text/plain; charset=utf-8", keep_alive=True,
+                   headers=None):
+        """写出响应；较大的响应体分块写出，并等待对方读取（背压）"""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        lines = [
+            "HTTP/1.1 %s %s" % (status, REASONS.get(status, "")),
+            "Content-Type: %s" % content_type,
+            "Content-Length: %s" % len(body),
+            "Connection: %s" % ("keep-alive" if keep_alive else "close"),
+        ]
+        lines += ["%s: %s" % item for item in (headers or {}).items()]
+        try:
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            view = memoryview(body)
+            for offset in range(0, len(body), CHUNK_SIZE):
+                writer.write(view[offset:offset + CHUNK_SIZE])
+                await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve(self, host="127.0.0.1", port=8765, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="本机 HTTP 转换服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="工作进程数")
+    parser.add_argument("--queue", type=int, default=32, help="允许排队等待的转换数，超出时返回 429")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求的超时秒数，超时返回 504")
+    parser.add_argument("--max-body", type=int, default=16 * 1024 * 1024, help="请求体的最大字节数")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("--compression", choices=sorted(lab.COMPRESSION), help="默认的输出压缩模式")
+    return parser.parse_args(argv)
+
+
+def cli(argv=None):
+    args   = parse_args(argv)
+    server = ConversionServer(args.jobs, args.queue, args.timeout, args.max_body,
+                              args.font, args.bold_font, args.compression)
+    server.warm_up()
+    print("正在监听 http://%s:%s（%s 个工作进程）" % (args.host, args.port, server.workers))
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,194 @@
+"""
+与图形界面无关的转换任务队列。
+
+任务在后台线程中依次执行，提交（submit）立即返回，长时间的转换不会阻塞新任务的提交。
+订阅者（subscribe）会收到每个任务的状态变化与转换过程中的进度事件：
+
+    service = ConversionService()
+    service.subscribe(lambda job_id, stage, info: print(job_id, stage, info))
+    job_id = service.submit("笔记.txt")
+    service.cancel(job_id)
+
+事件阶段依次为 "queued"、"running"、"parsed"、"laid_out"、"catalog"、
+若干次 "rendering"、"saved"，最终以 "done"、"failed" 或 "cancelled" 之一结束。
+"""
+
+import os
+import time
+import queue
+import itertools
+import threading
+
+import rlab_stage_3 as main
+
+
+class ConversionCancelled(Exception):
+    """转换被取消"""
+
+
+class Job():
+    """一个转换任务的状态"""
+    def __init__(self, job_id, path, output=None):
+        self.id        = job_id
+        self.path      = path
+        self.output    = output
+        self.status    = "queued"                                               # queued / running / done / failed / cancelled
+        self.stage     = "queued"                                               # 最近一次进度事件的阶段
+        self.result    = None                                                   # 生成的 pdf 路径
+        self.error     = None
+        self.submitted = time.time()
+        self.started   = None
+        self.finished  = None
+        self.saved     = False                                                  # pdf 是否已写出（此后不能再取消）
+        self.cancel_requested = threading.Event()
+        self.finished_event   = threading.Event()
+
+    def to_dict(self):
+        return {
+            "id":        self.id,
+            "path":      self.path,
+            "output":    self.output,
+            "status":    self.status,
+            "stage":     self.stage,
+            "result":    self.result,
+            "error":     self.error,
+            "submitted": self.submitted,
+            "started":   self.started,
+            "finished":  self.finished,
+        }
+
+
+class ConversionService():
+    """后台线程执行的转换任务队列，提供提交、取消、查询与进度订阅"""
+    def __init__(self, workers=1, font_normal=main.FONT_NORMAL, font_bold=main.FONT_BOLD, compression=None):
+        self.font_normal = os.path.abspath(font_normal)
+        self.font_bold   = os.path.abspath(font_bold)
+        self.compression = compression                                          # 输出压缩模式（见 lab.COMPRESSION）
+
+        self.jobs        = {}                                                   # 任务编号 -> Job
+        self.subscribers = []
+        self.queue       = queue.Queue()
+        self.lock        = threading.Lock()
+        self.ids         = itertools.count(1)
+
+        self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def subscribe(self, callback):
+        """订阅事件：callback(任务编号, 阶段, 信息字典)。回调在工作线程中被调用。"""
+        with self.lock:
+            self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers.remove(callback)
+
+    def submit(self, path, output=None):
+        """提交一个转换任务，立即返回任务编号"""
+        job = Job(next(self.ids), path, output)
+        with self.lock:
+            self.jobs[job.id] = job
+        self._emit(job, "queued", {"path": path})
+        self.queue.put(job)
+        return job.id
+
+    def cancel(self, job_id):
+        """
+        取消任务。排队中的任务直接取消；执行中的任务在下一个进度事件处中止。
+        任务已结束或 pdf 已写出（"saved"）时不能再取消，返回 False。
+        """
+        job = self.jobs[job_id]
+        with self.lock:
+            if job.status in ("done", "failed", "cancelled") or job.saved:
+                return False
+            job.cancel_requested.set()
+            queued = job.status == "queued"
+            if queued:
+                self._mark(job, "cancelled")
+        if queued:
+            self._announce(job, "cancelled", {})
+        return True
+
+    def status(self, job_id=None):
+        """查询单个任务（或全部任务）的状态"""
+        if job_id is not None:
+            return self.jobs[job_id].to_dict()
+        with self.lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def pending(self):
+        """排队与执行中的任务数"""
+        with self.lock:
+            return sum(job.status in ("queued", "running") for job in self.jobs.values())
+
+    def wait(self, job_id, timeout=None):
+        """等待任务结束，返回其状态"""
+        self.jobs[job_id].finished_event.wait(timeout)
+        return self.status(job_id)
+
+    def shutdown(self, wait=True):
+        """停止工作线程（已提交的任务会先执行完）"""
+        for _ in self.threads:
+            self.queue.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    # ---------------------------------------------
+
+    def _emit(self, job, stage, info):
+        job.stage = stage
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            callback(job.id, stage, info)
+
+    def _mark(self, job, status):
+        # 调用方需持有 self.lock
+        job.status   = status
+        job.finished = time.time()
+
+    def _announce(self, job, status, info):
+        # 在锁外发送结束事件，之后才唤醒 wait()
+        self._emit(job, status, info)
+        job.finished_event.set()
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+
+            with self.lock:
+                if job.status != "queued":                                      # 已在排队时被取消
+                    continue
+                job.status  = "running"
+                job.started = time.time()
+            self._emit(job, "running", {})
+
+            def progress(stage, info, job=job):
+                with self.lock:
+                    if job.cancel_requested.is_set():
+                        if stage == "saved":
+                            os.remove(info["file"])                             # 取消先于写出完成：不留下文件
+                        raise ConversionCancelled()
+                    if stage == "saved":
+                        job.saved = True                                        # 文件已写出，之后的取消不再生效
+                self._emit(job, stage, info)
+
+            try:
+                job.result = main.main(job.path, font_normal=self.font_normal, font_bold=self.font_bold,
+                                       output=job.output, progress=progress, compression=self.compression)
+            except ConversionCancelled:
+                status, info = "cancelled", {}
+            except Exception as e:
+                job.error = "%s: %s" % (type(e).__name__, e)
+                status, info = "failed", {"error": job.error}
+            else:
+                status, info = "done", {"file": job.result}
+
+            with self.lock:
+                self._mark(job, status)
+            self._announce(job, status, info)
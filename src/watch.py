@@ -0,0 +1,173 @@
+"""
+监视模式：常驻进程，监视若干目录中 .txt 文件的变动并自动重新转换。
+
+    python watch.py 笔记目录 -o 输出目录 --debounce 1.0 --status 状态.json
+
+通过定时比较文件的修改时间与大小发现变动，不依赖任何第三方库。
+一个文件在 debounce 秒内没有再次变动才会被转换，连续多次保存只转换一次。
+字体与字形宽度表只在启动时加载一次，之后所有转换都复用。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+
+import rlab_stage_2 as lab
+import rlab_stage_3 as main
+import batch
+
+
+class Watcher():
+    """监视目录中 .txt 文件的变动，并在文件稳定后逐个转换"""
+    def __init__(self, roots, output_dir=None, debounce=1.0,
+                 font_normal=main.FONT_NORMAL, font_bold=main.FONT_BOLD, compression=None, chapter_cache_dir=None):
+        self.roots       = [os.path.abspath(root) for root in roots]
+        self.output_dir  = output_dir
+        self.debounce    = debounce
+        self.font_normal = os.path.abspath(font_normal)
+        self.font_bold   = os.path.abspath(font_bold)
+        self.compression = compression
+        self.chapter_cache_dir = chapter_cache_dir                              # 章节缓存目录（见 main.ChapterCache）
+
+        self.seen      = {}                                                     # 路径 -> (修改时间, 大小)
+        self.scanned   = False                                                  # 是否已完成首次扫描
+        self.pending   = {}                                                     # 等待转换的路径 -> 最近一次变动的时间
+        self.latencies = deque(maxlen=1000)                                     # 最近若干次转换的耗时
+        self.done      = 0                                                      # 成功转换次数
+        self.failed    = 0                                                      # 失败次数
+        self.last_job  = None                                                   # 最近一次转换的结果记录
+
+        batch.warm_fonts(self.font_normal, self.font_bold)
+
+    def iter_sources(self):
+        for root in self.roots:
+            for folder, dirs, files in os.walk(root):
+                for name in files:
+                    if name.lower().endswith(".txt"):
+                        yield root, os.path.join(folder, name)
+
+    def output_for(self, root, path):
+        """源文件对应的输出路径"""
+        if self.output_dir:
+            relative = os.path.relpath(path, root)
+            return os.path.join(self.output_dir, lab.cut_extname(relative) + ".pdf")
+        return lab.cut_extname(path) + ".pdf"
+
+    def scan(self, now=None):
+        """扫描一遍所有目录，记录新出现或有变动的文件。首次扫描只记录现状，不触发转换。"""
+        now   = time.monotonic() if now is None else now
+        alive = set()
+        for root, path in self.iter_sources():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            alive.add(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self.seen.get(path) != signature:
+                if self.scanned:
+                    self.pending[path] = (root, now)                            # 每次变动都重新计时（防抖）
+                self.seen[path] = signature
+
+        for path in [p for p in self.seen if p not in alive]:                   # 已删除的文件
+            del self.seen[path]
+            self.pending.pop(path, None)
+        self.scanned = True
+
+    def ready(self, now=None):
+        """返回已稳定 debounce 秒、可以转换的文件"""
+        now = time.monotonic() if now is None else now
+        return [path for path, (root, changed) in self.pending.items()
+                if now - changed >= self.debounce]
+
+    def convert(self, path):
+        root, changed = self.pending.pop(path)
+        record = batch.convert(path, self.output_for(root, path), self.font_normal, self.font_bold,
+                               compression=self.compression, chapter_cache_dir=self.chapter_cache_dir)
+        self.latencies.append(record["seconds"])
+        if record["status"] == "ok":
+            self.done += 1
+        else:
+            self.failed += 1
+        self.last_job = record
+        return record
+
+    def stats(self):
+        """队列深度与转换耗时统计"""
+        latencies = sorted(self.latencies)
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        return {
+            "queue":    len(self.pending),
+            "done":     self.done,
+            "failed":   self.failed,
+            "watching": len(self.seen),
+            "latency": {
+                "last": self.latencies[-1] if self.latencies else None,
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "p50":  percentile(0.5),
+                "p95":  percentile(0.95),
+            },
+            "last_job": self.last_job,
+            "fonts":    lab.font_cache.stats(),
+        }
+
+    def step(self):
+        """扫描一次并转换所有已稳定的文件，返回本次转换的结果记录"""
+        self.scan()
+        return [self.convert(path) for path in self.ready()]
+
+    def run(self, interval=0.5, status_path=None, log=print):
+        while True:
+            for record in self.step():
+                stats = self.stats()
+                if record["status"] == "ok":
+                    log("%8.3fs  %10s  %s  (队列 %s)" % (record["seconds"], batch.format_bytes(record["bytes"]),
+                                                        record["output"], stats["queue"]))
+                else:
+                    log("   失败   %s  %s" % (record["source"], record["error"]))
+                if status_path:
+                    write_status(status_path, stats)
+            time.sleep(interval)
+
+
+def write_status(path, stats):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(stats, file, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="监视目录并自动将改动过的 txt 笔记转换为 pdf")
+    parser.add_argument("paths", nargs="+", help="要监视的目录")
+    parser.add_argument("-o", "--output-dir", help="输出目录（默认与源文件放在一起）")
+    parser.add_argument("--debounce", type=float, default=1.0, help="文件停止变动多少秒后才转换")
+    parser.add_argument("--interval", type=float, default=0.5, help="扫描间隔（秒）")
+    parser.add_argument("--status", help="每次转换后将队列深度与耗时统计写入该 JSON 文件")
+    parser.add_argument("--font", default=main.FONT_NORMAL, help="正文字体文件")
+    parser.add_argument("--bold-font", default=main.FONT_BOLD, help="粗体字体文件")
+    parser.add_argument("--compression", choices=sorted(lab.COMPRESSION), help="输出压缩模式（默认沿用 reportlab 的设置）")
+    parser.add_argument("--chapter-cache", help="章节缓存目录：只重新渲染改动过的章节")
+    return parser.parse_args(argv)
+
+
+def cli(argv=None):
+    args = parse_args(argv)
+    watcher = Watcher(args.paths, args.output_dir, args.debounce,
+                      args.font, args.bold_font, args.compression, args.chapter_cache)
+    print("正在监视：%s" % "、".join(watcher.roots))
+    try:
+        watcher.run(args.interval, args.status)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+
+@pytest.fixture(scope="session")
+def fonts():
+    """
+    (正文字体, 粗体字体) 的绝对路径：取环境变量 TXT2PDF_FONT / TXT2PDF_BOLD_FONT，
+    否则使用 src 目录中的默认字体文件；找不到字体时跳过需要渲染的测试。
+    """
+    import rlab_stage_3 as main
+    paths = (os.environ.get("TXT2PDF_FONT", os.path.join(SRC, main.FONT_NORMAL)),
+             os.environ.get("TXT2PDF_BOLD_FONT", os.path.join(SRC, main.FONT_BOLD)))
+    for path in paths:
+        if not os.path.exists(path):
+            pytest.skip("缺少字体文件 %s" % path)
+    return tuple(os.path.abspath(path) for path in paths)
@@ -0,0 +1,85 @@
+import pytest
+
+import rlab_stage_2 as lab
+import rlab_stage_3 as main
+import batch
+from bench import generate
+
+pypdf = pytest.importorskip("pypdf")
+
+
+@pytest.fixture
+def notes(tmp_path):
+    folder = tmp_path / "notes"
+    folder.mkdir()
+    paths = []
+    for n, name in enumerate(["甲", "乙", "丙"]):
+        path = folder / ("%d-%s.txt" % (n, name))
+        path.write_text(generate.generate(seed=n, lines=120 + 80 * n, headings=6), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def outline(reader, items):
+    return [outline(reader, item) if isinstance(item, list) else (item.title, reader.get_destination_page_number(item))
+            for item in items]
+
+
+def flatten(tree):
+    for item in tree:
+        if isinstance(item, list):
+            yield from flatten(item)
+        else:
+            yield item
+
+
+def headings(path):
+    """单独转换时的一级标题（不含封面）"""
+    with open(path, encoding="utf-8") as file:
+        return [text for kind, text in main.iter_pdf_content(main.iter_events(file)) if kind == "h1"]
+
+
+def test_bundle_pages_outline_and_catalog_links(fonts, notes, tmp_path):
+    info = {}
+    output = main.main_bundle(notes, str(tmp_path / "合集.pdf"), fonts[0], fonts[1], deterministic=True,
+                              progress=lambda stage, value: info.update(value))
+    reader = pypdf.PdfReader(output, strict=True)
+
+    # 页数：封面 + 目录 + 各文档（单独转换且不带目录时的页数，即标题页 + 正文）
+    singles = [len(pypdf.PdfReader(main.main(path, font_normal=fonts[0], font_bold=fonts[1],
+                                             output=str(tmp_path / ("%d.pdf" % n)), catalog=False)).pages)
+               for n, path in enumerate(notes)]
+    catalog_pages = info["catalog_pages"]
+    assert catalog_pages >= 1
+    assert len(reader.pages) == 1 + catalog_pages + sum(singles)
+
+    # 大纲：目录，然后每篇文档一个顶层条目，其下是该文档的标题；每篇文档从其标题页开始
+    tree = outline(reader, reader.outline)
+    assert tree[0] == ("目录", 1)
+    sections = tree[1:]
+    start = 1 + catalog_pages
+    for n, path in enumerate(notes):
+        title, children = sections[2 * n], sections[2 * n + 1]
+        assert title == (lab.get_barefilename(path), start)
+        assert [item[0] for item in children if not isinstance(item, list)] == headings(path)
+        assert all(start < page < start + singles[n] for text, page in flatten(children))
+        start += singles[n]
+
+    # 目录中的链接依次指向各标题所在页
+    targets = []
+    for page in reader.pages[1:1 + catalog_pages]:
+        for annotation in page.get("/Annots") or []:
+            dest = annotation.get_object().get("/Dest")
+            if isinstance(dest, pypdf.generic.ArrayObject):
+                targets.append(reader.get_page_number(dest[0].get_object().indirect_reference))
+    assert targets == [page for text, page in flatten(sections)]
+
+
+def test_bundle_cli(fonts, notes, tmp_path, capsys):
+    output = tmp_path / "cli.pdf"
+    status = batch.cli([str(tmp_path / "notes"), "--bundle", str(output), "--font", fonts[0],
+                        "--bold-font", fonts[1], "--no-catalog", "--deterministic"])
+    assert status == 0
+    reader = pypdf.PdfReader(str(output), strict=True)
+    assert [title for title, page in outline(reader, reader.outline)[::2]] == ["0-甲", "1-乙", "2-丙"]
+    assert "共 3 个文件合并为" in capsys.readouterr().out
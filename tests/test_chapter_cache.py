@@ -0,0 +1,94 @@
+import pytest
+
+import rlab_stage_3 as main
+
+pypdf = pytest.importorskip("pypdf")
+
+
+WORDS = ["quick", "brown", "αβγδ", "Привет", "café", "naïve", "λόγος", "мир", "über", "0123"]
+
+
+def document(chapters=6, lines=80, extra=None):
+    """每章一个一级标题与两个二级标题；extra 为 {章号: 追加的正文行} 用于模拟改动"""
+    text = []
+    for n in range(chapters):
+        text.append("第%d章：\n" % n)
+        for part in range(2):
+            text.append("\t小节%d：\n" % part)
+            for m in range(lines // 2):
+                text.append("\t\t%s\n" % " ".join(WORDS[(n + m + k) % len(WORDS)] for k in range(12)))
+            for line in (extra or {}).get(n, []):
+                text.append("\t\t%s\n" % line)
+        text.append("\n")
+    return "".join(text)
+
+
+def readable(path):
+    """各页的文字与链接、大纲与命名目标（与字形编码无关）"""
+    reader = pypdf.PdfReader(path, strict=True)
+    pages  = []
+    for page in reader.pages:
+        links = []
+        for annotation in page.get("/Annots") or []:
+            annotation = annotation.get_object()
+            dest = annotation.get("/Dest")
+            if isinstance(dest, pypdf.generic.ArrayObject):
+                dest = (reader.get_page_number(dest[0].get_object().indirect_reference), list(dest[1:]))
+            links.append(([round(float(v), 2) for v in annotation["/Rect"]], dest))
+        pages.append((page.extract_text(), links))
+
+    def outline(items):
+        return [outline(item) if isinstance(item, list) else (item.title, reader.get_destination_page_number(item))
+                for item in items]
+
+    dests = {name: reader.get_destination_page_number(dest) for name, dest in reader.named_destinations.items()}
+    return pages, outline(reader.outline), dests
+
+
+@pytest.mark.parametrize("catalog", [True, False])
+def test_second_build_replays_every_chapter(fonts, tmp_path, catalog):
+    source = tmp_path / "notes.txt"
+    source.write_text(document(), encoding="utf-8")
+    options = dict(font_normal=fonts[0], font_bold=fonts[1], catalog=catalog, deterministic=True)
+    cache   = main.ChapterCache(str(tmp_path / "cache"))
+
+    plain = main.main(str(source), output=str(tmp_path / "plain.pdf"), **options)
+    first = main.main(str(source), output=str(tmp_path / "first.pdf"), chapter_cache=cache, **options)
+    assert cache.last_build == {"chapters": 6, "hits": 0, "misses": 6, "hit_rate": 0.0}
+
+    saved  = {}
+    second = main.main(str(source), output=str(tmp_path / "second.pdf"), chapter_cache=cache,
+                       progress=lambda stage, info: saved.update(info) if stage == "saved" else None, **options)
+    assert saved["chapter_cache"] == {"chapters": 6, "hits": 6, "misses": 0, "hit_rate": 1.0}
+
+    with open(plain, "rb") as a, open(first, "rb") as b, open(second, "rb") as c:
+        expected = a.read()
+        assert b.read() == expected
+        assert c.read() == expected
+
+
+def test_edited_chapter_is_rendered_again(fonts, tmp_path):
+    source  = tmp_path / "notes.txt"
+    options = dict(font_normal=fonts[0], font_bold=fonts[1], deterministic=True)
+    cache   = main.ChapterCache(str(tmp_path / "cache"))
+
+    source.write_text(document(), encoding="utf-8")
+    main.main(str(source), output=str(tmp_path / "first.pdf"), chapter_cache=cache, **options)
+
+    # 第 2 章加长两页并用到新字符：之后各章的页码都后移
+    source.write_text(document(extra={2: ["Ωμέγα ǅ ŧ ß"] * 90}), encoding="utf-8")
+    cached = main.main(str(source), output=str(tmp_path / "cached.pdf"), chapter_cache=cache, **options)
+    assert cache.last_build["hits"] == 5 and cache.last_build["misses"] == 1
+
+    plain = main.main(str(source), output=str(tmp_path / "plain.pdf"), **options)
+    assert readable(cached) == readable(plain)
+
+
+def test_stale_font_codes_are_dropped(tmp_path):
+    cache = main.ChapterCache(str(tmp_path))
+    codes = {"normal": "abcαβγ", "bold": "".join(chr(0x400 + n) for n in range(100))}
+    cache.put_font_codes("doc", codes)
+
+    assert cache.font_codes("doc", set(codes["bold"])) == codes
+    assert cache.font_codes("doc", set("αβγ")) == {}                            # 100 个不再出现的字符
+    assert cache.font_codes("missing", set()) == {}
@@ -0,0 +1,97 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+import rlab_stage_3 as main
+from conftest import SRC
+
+
+NOTE = "第一章：\n\t小节：\n\t\t内容 alpha\n第二章：\n\tbeta\n"
+
+SCRIPT = """
+import sys
+sys.path.insert(0, %r)
+import rlab_stage_3 as main
+main.main(%r, font_normal=%r, font_bold=%r, output=%r, deterministic=True)
+"""
+
+
+@pytest.fixture
+def note(tmp_path):
+    path = tmp_path / "note.txt"
+    path.write_text(NOTE, encoding="utf-8")
+    return str(path)
+
+
+def test_second_conversion_is_a_hit(fonts, note, tmp_path):
+    cache = main.ConversionCache(str(tmp_path / "cache"))
+    saved = []
+    progress = lambda stage, info: saved.append(info) if stage == "saved" else None
+
+    first  = main.main(note, font_normal=fonts[0], font_bold=fonts[1], output=str(tmp_path / "a.pdf"),
+                       progress=progress, pdf_cache=cache)
+    second = main.main(note, font_normal=fonts[0], font_bold=fonts[1], output=str(tmp_path / "b.pdf"),
+                       progress=progress, pdf_cache=cache)
+
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    assert "cached" not in saved[0] and saved[1]["cached"] is True
+    assert saved[1]["pages"] == saved[0]["pages"] and saved[1]["bytes"] == saved[0]["bytes"]
+    with open(first, "rb") as a, open(second, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_incomplete_entry_is_a_miss(fonts, note, tmp_path):
+    cache = main.ConversionCache(str(tmp_path / "cache"))
+    key   = cache.key(note, fonts[0], fonts[1], compression=None, catalog=True)       # 与 main 使用的键相同
+    main.main(note, font_normal=fonts[0], font_bold=fonts[1], output=str(tmp_path / "a.pdf"), pdf_cache=cache)
+
+    os.remove(os.path.join(cache.cache_dir, key + ".pdf.json"))                 # 信息文件不存在即视为条目不完整
+    assert cache.get(key, str(tmp_path / "b.pdf")) is None
+    assert cache.misses == 2
+
+
+def test_key_changes_with_inputs(fonts, note, tmp_path, monkeypatch):
+    cache = main.ConversionCache(str(tmp_path / "cache"))
+    base  = cache.key(note, fonts[0], fonts[1])
+    assert cache.key(note, fonts[0], fonts[1]) == base
+
+    keys = {
+        "fonts":       cache.key(note, fonts[1], fonts[0]),
+        "page_size":   cache.key(note, fonts[0], fonts[1], page_size=(500, 700)),
+        "compression": cache.key(note, fonts[0], fonts[1], compression="fast"),
+        "catalog":     cache.key(note, fonts[0], fonts[1], catalog=False),
+    }
+
+    renamed = tmp_path / "renamed.txt"                                          # 文件名是封面标题
+    renamed.write_text(NOTE, encoding="utf-8")
+    keys["name"] = cache.key(str(renamed), fonts[0], fonts[1])
+
+    with open(note, "a", encoding="utf-8") as file:
+        file.write("\tgamma\n")
+    keys["content"] = cache.key(note, fonts[0], fonts[1])
+
+    monkeypatch.setattr(main, "LAYOUT_VERSION", main.LAYOUT_VERSION + 1)
+    keys["layout_version"] = cache.key(note, fonts[0], fonts[1])
+    monkeypatch.setattr(main, "OUTPUT_VERSION", main.OUTPUT_VERSION + 1)
+    keys["output_version"] = cache.key(note, fonts[0], fonts[1])
+
+    assert base not in keys.values()
+    assert len(set(keys.values())) == len(keys)
+
+
+def test_output_is_identical_across_processes(fonts, note, tmp_path):
+    outputs = [str(tmp_path / ("%d.pdf" % n)) for n in range(2)]
+    for output in outputs:
+        subprocess.run([sys.executable, "-c", SCRIPT % (SRC, note, fonts[0], fonts[1], output)], check=True)
+
+    cache  = main.ConversionCache(str(tmp_path / "cache"))
+    cached = main.main(note, font_normal=fonts[0], font_bold=fonts[1], output=str(tmp_path / "c.pdf"),
+                       pdf_cache=cache)
+
+    contents = []
+    for path in outputs + [cached]:
+        with open(path, "rb") as file:
+            contents.append(file.read())
+    assert contents[0] == contents[1] == contents[2]
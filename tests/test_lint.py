@@ -0,0 +1,91 @@
+import io
+import sys
+import random
+import subprocess
+
+import pytest
+
+import rlab_stage_3 as main
+import lint
+from bench import generate
+from conftest import SRC
+
+
+CASES = [
+    "标题：\n\t内容\n",
+    "内容在外部\n",
+    "标题：\n\t\t\t跳了两级\n",
+    "标题：\n\t内容\n\t小节：\n",
+    "标题：\n\t内容\n\t\t续行\n\t\t子标题：\n",
+    "标题：\n\t小节：\n\t\t内容\n\t直接内容\n",
+    "标题：\n\t小节：\n\t\t内容\n标题二：\n\t\t\t\t过深\n",
+    "一：\n\t二：\n\t\t三：\n\t\t\t四：\n\t\t\t\t内容\n",
+    "\n\n标题：\n\n\t内容\n\n",
+]
+
+
+def mutate(text, r):
+    """随机破坏一篇合法文档的几行：改变缩进、加上或去掉冒号"""
+    lines = text.split("\n")
+    for _ in range(r.randint(1, 3)):
+        n    = r.randrange(len(lines))
+        line = lines[n]
+        kind = r.randrange(4)
+        if kind == 0:
+            lines[n] = "\t" * r.randint(1, 3) + line
+        elif kind == 1:
+            lines[n] = line[1:] if line.startswith("\t") else line
+        elif kind == 2:
+            lines[n] = line + "："
+        elif line.endswith("："):
+            lines[n] = line[:-1]
+    return "\n".join(lines)
+
+
+def documents():
+    r = random.Random(25)
+    yield from CASES
+    for seed in range(150):
+        text = generate.generate(seed=seed, lines=r.randint(5, 40), depth=4)
+        yield mutate(text, r) if seed % 5 else text
+
+
+def first_error(text):
+    """iter_events 报出的错误 (行索引, 信息)，没有错误时返回 None"""
+    try:
+        list(main.iter_events(io.StringIO(text)))
+    except main.FormatError as e:
+        message, line = str(e).rsplit("，第 ", 1)
+        return int(line.rstrip(" 行")), message
+    return None
+
+
+@pytest.mark.parametrize("text", list(documents()))
+def test_first_problem_matches_iter_events(text):
+    errors = [(i, message) for i, severity, message in main.iter_problems(io.StringIO(text))
+              if severity == "error"]
+    expected = first_error(text)
+    if expected is None:
+        assert errors == []
+    else:
+        assert errors and errors[0] == expected
+
+
+def test_check_file_reports_one_based_lines(tmp_path):
+    path = tmp_path / "bad.txt"
+    path.write_text("标题：\n\t内容\n\t\t续行\n\t\t子标题：\n外部内容\n", encoding="utf-8")
+    problems = lint.check_file(str(path))["problems"]
+    assert [line for line, severity, message in problems] == [4, 5]
+
+
+def test_lint_does_not_import_reportlab(tmp_path):
+    good = tmp_path / "good.txt"
+    bad  = tmp_path / "bad.txt"
+    good.write_text("标题：\n\t内容\n", encoding="utf-8")
+    bad.write_text("内容在外部\n", encoding="utf-8")
+    code = ("import sys; sys.path.insert(0, %r); import lint\n"
+            "status = lint.cli([%r, %r, '-j', '1'])\n"
+            "loaded = sorted(name for name in sys.modules if name.split('.')[0] == 'reportlab')\n"
+            "print(status, loaded)" % (SRC, str(good), str(bad)))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "1 []"
@@ -0,0 +1,29 @@
+import pytest
+
+import rlab_stage_3 as main
+import parallel
+from bench import generate
+from test_stream import summary
+
+pytest.importorskip("pypdf")
+
+
+@pytest.mark.parametrize("catalog", [True, False])
+def test_parallel_matches_serial(fonts, tmp_path, catalog):
+    source = tmp_path / "parallel.txt"
+    source.write_text(generate.generate(seed=5, lines=600, headings=12), encoding="utf-8")
+
+    expected = main.main(str(source), font_normal=fonts[0], font_bold=fonts[1], catalog=catalog,
+                         output=str(tmp_path / "serial.pdf"))
+    merged   = parallel.convert(str(source), workers=3, font_normal=fonts[0], font_bold=fonts[1],
+                                output=str(tmp_path / "merged.pdf"), catalog=catalog)
+
+    # 各段各自生成字体子集，内容流中的字形编码可能不同；页数、链接、大纲与命名目标应一致
+    # （reportlab 写出的链接区域只保留 4 位小数）
+    def links(pages):
+        return [[([round(v, 2) for v in rect], dest) for rect, dest in page_links] for _, page_links in pages]
+
+    pages, outline, dests = summary(merged)
+    expected_pages, expected_outline, expected_dests = summary(expected)
+    assert links(pages) == links(expected_pages)
+    assert (outline, dests) == (expected_outline, expected_dests)
@@ -0,0 +1,114 @@
+import json
+import time
+import socket
+import asyncio
+import threading
+import http.client
+from urllib.parse import quote
+
+import pytest
+
+import server as http_server
+
+
+NOTE = "第一章：\n\t小节：\n\t\t内容 alpha\n第二章：\n\tbeta\n"
+
+
+@pytest.fixture(scope="module")
+def service(fonts):
+    """在后台线程的事件循环中运行的服务（端口 0，一个工作进程，不允许排队）"""
+    srv = http_server.ConversionServer(workers=1, queue_size=0, timeout=30, font_normal=fonts[0],
+                                       font_bold=fonts[1])
+    srv.warm_up()
+    srv.errors = []
+    loop    = asyncio.new_event_loop()
+    started = threading.Event()
+    loop.set_exception_handler(lambda loop, context: srv.errors.append(context))
+
+    def ready(server):
+        srv.port = server.sockets[0].getsockname()[1]
+        started.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(srv.serve("127.0.0.1", 0, ready))
+        except RuntimeError:                                                    # loop.stop()
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield srv
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+    srv.close()
+
+
+def request(srv, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=30)
+    try:
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def wait_idle(srv):
+    deadline = time.monotonic() + 30
+    while srv.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert srv.pending == 0
+
+
+def test_convert_returns_pdf(service):
+    status, body = request(service, "POST", "/convert?name=" + quote("笔记"), NOTE.encode("utf-8"))
+    assert status == 200 and body.startswith(b"%PDF")
+
+
+@pytest.mark.parametrize("name", ["a%00b", "a%2Fb", "..", "x%0Ay", "a%3Fb", pytest.param("x" * 201, id="too-long")])
+def test_invalid_name_is_rejected(service, name):
+    status, body = request(service, "POST", "/convert?name=" + name, NOTE.encode("utf-8"))
+    assert status == 400, body.decode("utf-8")
+
+
+def test_format_error_is_rejected_with_line(service):
+    bad = "第一章：\n\t正文\n\t小节：\n\t\t内容\n".encode("utf-8")
+    status, body = request(service, "POST", "/convert", bad)
+    assert status == 400 and "行" in body.decode("utf-8")
+
+
+def test_full_queue_is_rejected(service):
+    service.pending = service.capacity                                          # 名额已被占满
+    try:
+        status, body = request(service, "POST", "/convert", NOTE.encode("utf-8"))
+    finally:
+        service.pending = 0
+    assert status == 429
+
+
+def test_slow_conversion_times_out(service):
+    service.timeout = 1e-6
+    try:
+        status, body = request(service, "POST", "/convert", NOTE.encode("utf-8"))
+    finally:
+        service.timeout = 30
+    assert status == 504
+    wait_idle(service)                                                          # 已开始的转换在后台跑完后释放名额
+
+
+def test_client_disconnecting_mid_body_is_ignored(service):
+    with socket.create_connection(("127.0.0.1", service.port), timeout=10) as client:
+        client.sendall(b"POST /convert HTTP/1.1\r\nContent-Length: 1000\r\n\r\n" + b"x" * 10)
+    status, body = request(service, "GET", "/health")
+    assert status == 200 and body == b"ok"
+    assert service.errors == []
+
+
+def test_metrics_count_requests(service):
+    status, body = request(service, "GET", "/metrics")
+    counts = json.loads(body)["counts"]
+    assert status == 200
+    assert counts["ok"] >= 1 and counts["rejected"] >= 1 and counts["timeouts"] >= 1
+    assert counts["bad_requests"] >= 7
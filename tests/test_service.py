@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+
+import service as conversion
+
+
+NOTE = "第一章：\n\t小节：\n\t\t内容 alpha\n\t\t内容 beta\n第二章：\n\tgamma\n"
+
+
+@pytest.fixture
+def note(tmp_path):
+    path = tmp_path / "note.txt"
+    path.write_text(NOTE, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def service(fonts):
+    service = conversion.ConversionService(font_normal=fonts[0], font_bold=fonts[1])
+    yield service
+    service.shutdown()
+
+
+class Gate():
+    """订阅者：记录全部事件，在任务进入指定阶段时停住工作线程，直到 release"""
+    def __init__(self, job_id=None, stage=None):
+        self.events   = []
+        self.job_id   = job_id
+        self.stage    = stage
+        self.reached  = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self, job_id, stage, info):
+        self.events.append((job_id, stage))
+        if (job_id, stage) == (self.job_id, self.stage):
+            self.reached.set()
+            assert self.released.wait(10)
+
+    def release(self):
+        self.released.set()
+
+    def stages(self, job_id):
+        return [stage for id, stage in self.events if id == job_id]
+
+
+def test_submit_runs_job_and_reports_stages_in_order(service, note, tmp_path):
+    gate = service.subscribe(Gate())
+    output = tmp_path / "out.pdf"
+    job_id = service.submit(str(note), str(output))
+
+    status = service.wait(job_id, 30)
+    assert status["status"] == "done" and status["result"] == str(output)
+    assert output.exists()
+    assert status["started"] >= status["submitted"] and status["finished"] >= status["started"]
+    assert gate.stages(job_id) == ["queued", "running", "parsed", "laid_out", "catalog",
+                                   "rendering", "rendering", "saved", "done"]
+
+
+def test_cancel_while_queued_and_while_running(service, note, tmp_path):
+    gate   = service.subscribe(Gate(1, "running"))
+    first  = service.submit(str(note), str(tmp_path / "first.pdf"))
+    second = service.submit(str(note), str(tmp_path / "second.pdf"))
+    assert gate.reached.wait(10)                                                # 第一个任务执行中，第二个在排队
+
+    assert service.pending() == 2
+    assert service.cancel(second)
+    assert service.status(second)["status"] == "cancelled"
+    assert service.cancel(first)
+    gate.release()
+
+    assert service.wait(first, 30)["status"] == "cancelled"
+    assert gate.stages(first) == ["queued", "running", "cancelled"]
+    assert gate.stages(second) == ["queued", "cancelled"]
+    assert not (tmp_path / "first.pdf").exists() and not (tmp_path / "second.pdf").exists()
+    assert not service.cancel(first)                                            # 已结束的任务
+    assert service.pending() == 0
+
+
+def test_cancel_after_saved_keeps_the_output(service, note, tmp_path):
+    gate   = service.subscribe(Gate(1, "saved"))
+    output = tmp_path / "out.pdf"
+    job_id = service.submit(str(note), str(output))
+    assert gate.reached.wait(30)
+
+    assert not service.cancel(job_id)
+    gate.release()
+    assert service.wait(job_id, 30)["status"] == "done"
+    assert output.exists()
+
+
+def test_cancel_requested_before_saved_removes_the_output(service, tmp_path):
+    note = tmp_path / "single.txt"
+    note.write_text("唯一一章：\n\t正文\n", encoding="utf-8")                   # 唯一的 "rendering" 之后就是 "saved"
+    gate   = service.subscribe(Gate(1, "rendering"))
+    output = tmp_path / "out.pdf"
+    job_id = service.submit(str(note), str(output))
+    assert gate.reached.wait(30)
+
+    service.jobs[job_id].cancel_requested.set()                                 # 取消请求在写出之前到达，但下一个事件才是 "saved"
+    gate.stage = None
+    gate.release()
+    assert service.wait(job_id, 30)["status"] == "cancelled"
+    assert not output.exists()
+
+
+def test_wait_times_out_while_running(service, note, tmp_path):
+    gate   = service.subscribe(Gate(1, "running"))
+    job_id = service.submit(str(note), str(tmp_path / "out.pdf"))
+    assert gate.reached.wait(10)
+
+    assert service.wait(job_id, 0.05)["status"] == "running"
+    gate.release()
+    assert service.wait(job_id, 30)["status"] == "done"
+
+
+def test_failed_job_reports_error(service, tmp_path):
+    job_id = service.submit(str(tmp_path / "missing.txt"))
+    status = service.wait(job_id, 30)
+    assert status["status"] == "failed" and "FileNotFoundError" in status["error"]
+
+
+def test_shutdown_finishes_submitted_jobs(fonts, note, tmp_path):
+    service = conversion.ConversionService(font_normal=fonts[0], font_bold=fonts[1])
+    jobs    = [service.submit(str(note), str(tmp_path / ("%d.pdf" % n))) for n in range(3)]
+    service.shutdown(wait=True)
+
+    assert all(not thread.is_alive() for thread in service.threads)
+    assert [service.status(job_id)["status"] for job_id in jobs] == ["done"] * 3
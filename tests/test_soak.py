@@ -0,0 +1,30 @@
+import os
+
+from bench import generate
+from bench import soak
+
+
+def test_repeated_conversion_keeps_no_objects_alive(fonts, tmp_path):
+    sources = []
+    for seed in range(2):
+        sources.append(str(tmp_path / ("soak%s.txt" % seed)))
+        with open(sources[-1], "w", encoding="utf-8") as file:
+            file.write(generate.generate(seed=seed, lines=60))
+
+    result = soak.soak(sources, iterations=6, warmup=2, font_normal=fonts[0], font_bold=fonts[1],
+                       output_dir=str(tmp_path), top=0)
+
+    assert result["live_objects"] == dict.fromkeys(result["live_objects"], 0)
+    assert soak.check(result, threshold=64 * 1024) == []
+    assert all(os.path.exists(str(tmp_path / ("%s.pdf" % n))) for n in range(len(sources)))
+
+
+def test_default_output_dir_is_removed(fonts, tmp_path, monkeypatch):
+    source = tmp_path / "soak.txt"
+    source.write_text(generate.generate(seed=1, lines=20), encoding="utf-8")
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setattr(soak.tempfile, "tempdir", str(scratch))                 # 临时目录建在这里，便于检查
+
+    soak.soak([str(source)], iterations=2, warmup=0, font_normal=fonts[0], font_bold=fonts[1], top=0)
+    assert os.listdir(str(scratch)) == []
@@ -0,0 +1,168 @@
+import time
+import random
+from array import array
+
+import pytest
+
+import rlab_stage_2 as lab
+from bench import generate
+
+
+# ---------- 单遍分行之前的实现（先逐个制表符替换为空格，再逐字分行），作为对照 ----------
+# 原实现换行后把 index 置为 1，之后每一行都多带一个字符；引入真实字形宽度时已改为在超出页宽的字符之前换行，
+# 这里的对照实现同样置为 0，其余与原实现相同。
+
+def old_split_lines_by_pagewidth(text, size, content_width):
+    lines = []
+    width = 0
+    index = 0
+    for char in text[:]:
+        if lab.is_halfwidth(char):
+            width += size / 2
+        else:
+            width += size
+
+        if width > content_width:
+            width = size / 2 if lab.is_halfwidth(char) else size
+            lines.append(text[:index])
+            text = text[index:]
+            index = 0
+
+        index += 1
+
+    lines.append(text)
+    return lines
+
+
+def old_freeze_tab(text):
+    tab_length = 8
+    offset     = 0
+    new_text   = text
+    for i in range(len(text)):
+        if text[i] == "\t":
+            vindex = lab.get_visualindex(new_text, i + offset)
+            mod = vindex % tab_length
+            new_text = lab.remove_char(new_text, i + offset)
+            new_text = lab.insert_string(new_text, i + offset, " " * (8 - mod))
+            offset  += 8 - mod - 1
+
+    return new_text
+
+
+def paragraphs(tabs, count=100):
+    r = random.Random(tabs)
+    for _ in range(count):
+        yield generate.make_paragraph(r, r.choice([5, 40, 300, 1000]), r.random(), tabs)
+
+
+@pytest.mark.parametrize("tabs", [0.0, 0.05, 0.3])
+@pytest.mark.parametrize("size, content_width", [(12, 500), (16, 500), (10, 120)])
+def test_split_tabbed_lines_matches_old(tabs, size, content_width):
+    for text in paragraphs(tabs):
+        expected = old_split_lines_by_pagewidth(old_freeze_tab(text), size, content_width)
+        assert lab.split_tabbed_lines(text, size, content_width) == expected
+
+
+@pytest.mark.parametrize("tabs", [0.0, 0.05, 0.3])
+def test_freeze_tab_matches_old(tabs):
+    for text in paragraphs(tabs):
+        assert lab.freeze_tab(text) == old_freeze_tab(text)
+
+
+def test_split_lines_by_pagewidth_keeps_tabs():
+    for text in paragraphs(0.1, 50):
+        assert lab.split_lines_by_pagewidth(text, 12, 500) == old_split_lines_by_pagewidth(text, 12, 500)
+
+
+def test_leading_and_consecutive_tabs():
+    for text in ["\t", "\t\t\t", "a\tb", "中\t文", "\t中文\t\tabc\t", "x" * 7 + "\t" + "y" * 9]:
+        expected = old_split_lines_by_pagewidth(old_freeze_tab(text), 12, 60)
+        assert lab.split_tabbed_lines(text, 12, 60) == expected
+
+
+def old_split_with_widths(text, size, content_width, widths):
+    """按字形宽度表逐字分行的对照实现（宽度以千分之一字号累加）"""
+    limit = content_width * 1000 / size
+    lines = [""]
+    width = 0
+    for char in text:
+        code = ord(char)
+        w = widths.widths[code] if code < len(widths.widths) else widths.default
+        width += w
+        if width > limit and lines[-1]:
+            lines.append("")
+            width = w
+        lines[-1] += char
+    return lines
+
+
+def sample_widths():
+    """ASCII 宽度各不相同、CJK 不在表内（使用默认宽度）的宽度表"""
+    r = random.Random(7)
+    return lab.WidthTable(array('f', [r.uniform(250, 900) for _ in range(0x3000)]), 1000.0)
+
+
+@pytest.mark.parametrize("tabs", [0.0, 0.05, 0.3])
+@pytest.mark.parametrize("size, content_width", [(12, 500), (10, 120)])
+def test_split_tabbed_lines_with_widths(tabs, size, content_width):
+    widths = sample_widths()
+    texts  = list(paragraphs(tabs)) + ["", "\t", "\t\t中文\tabc", "x" * 7 + "\t" + "y" * 9]
+    for text in texts:
+        expected = old_split_with_widths(old_freeze_tab(text), size, content_width, widths)
+        assert lab.split_tabbed_lines(text, size, content_width, widths=widths) == expected
+    assert lab.split_lines_by_pagewidth("a\tb", 12, 500, widths) == ["a\tb"]              # tab_length=0 时不展开
+
+
+def test_split_tabbed_lines_with_halfwidth_table_matches_estimate():
+    # 半角 500、全角 1000 的宽度表与按 2:1 估算的结果相同
+    table  = array('f', [500.0 if lab.is_halfwidth(chr(code)) else 1000.0 for code in range(0x3000)])
+    widths = lab.WidthTable(table, 1000.0)
+    for text in paragraphs(0.1, 50):
+        assert lab.split_tabbed_lines(text, 12, 500, widths=widths) == lab.split_tabbed_lines(text, 12, 500)
+
+
+@pytest.mark.parametrize("size, content_width", [(12, 500), (16, 500), (10, 120)])
+def test_split_contents_numpy_matches_pure_python(monkeypatch, size, content_width):
+    pytest.importorskip("numpy")
+    widths = sample_widths()
+    texts  = [text for tabs in (0.0, 0.05, 0.3) for text in paragraphs(tabs, 60)]
+    texts += ["", "\t", "\t\t", "中" * 200, "\t中文\t\tabc\t", "", "x" * 7 + "\t" + "y" * 9, "\t" * 40]
+
+    expected = lab.split_contents(texts, size, content_width, widths, vectorize=False)
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("split_contents 没有走 NumPy 路径")
+    monkeypatch.setattr(lab, "VECTORIZE_MIN_CHARS", 0)
+    monkeypatch.setattr(lab, "split_tabbed_lines", unexpected)
+    assert lab.split_contents(texts, size, content_width, widths) == expected
+
+
+def long_paragraph(chars, seed=1):
+    """约 chars 个字符、含制表符与中英文的单个段落（如粘贴进笔记的日志）"""
+    r      = random.Random(seed)
+    pieces = []
+    total  = 0
+    while total < chars:
+        piece   = generate.make_paragraph(r, 200, 0.5, 0.05)
+        total  += len(piece) + 1
+        pieces.append(piece)
+    return " ".join(pieces)[:chars]
+
+
+def best_time(function, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@pytest.mark.parametrize("widths", [None, "table"])
+def test_split_tabbed_lines_scales_linearly(widths):
+    widths = sample_widths() if widths else None
+    small  = long_paragraph(256 * 1024)
+    large  = long_paragraph(1024 * 1024)
+    ratio  = (best_time(lambda: lab.split_tabbed_lines(large, 12, 500, widths=widths))
+              / best_time(lambda: lab.split_tabbed_lines(small, 12, 500, widths=widths)))
+    assert ratio < 10                                                           # 线性约为 4（实测 4–6），平方复杂度约为 16
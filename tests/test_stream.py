@@ -0,0 +1,77 @@
+import re
+import tracemalloc
+
+import pytest
+
+import rlab_stage_3 as main
+from bench import generate
+from bench import memory
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def summary(path):
+    """各页的内容流与链接、大纲与命名目标（与对象编号无关）"""
+    reader = pypdf.PdfReader(path, strict=True)
+    pages  = []
+    for page in reader.pages:
+        links = []
+        for annotation in page.get("/Annots") or []:
+            annotation = annotation.get_object()
+            dest = annotation.get("/Dest")
+            if isinstance(dest, pypdf.generic.ArrayObject):
+                dest = (reader.get_page_number(dest[0].get_object().indirect_reference), list(dest[1:]))
+            links.append((list(annotation["/Rect"]), dest))
+        pages.append((page.get_contents().get_data(), links))
+
+    def outline(items):
+        return [outline(item) if isinstance(item, list) else (item.title, reader.get_destination_page_number(item))
+                for item in items]
+
+    dests = {name: reader.get_destination_page_number(dest) for name, dest in reader.named_destinations.items()}
+    return pages, outline(reader.outline), dests
+
+
+def xref_offsets_valid(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    xref    = data.rindex(b"\nxref\n") + 1
+    offsets = [int(offset) for offset in re.findall(rb"(\d{10}) 00000 n", data[xref:])]
+    start   = int(re.search(rb"startxref\n(\d+)", data[xref:]).group(1))
+    return (start == xref
+            and all(data.startswith(b"%d 0 obj" % (n + 1), offset) for n, offset in enumerate(offsets)))
+
+
+@pytest.mark.parametrize("compression", [None, "none", "fast"])
+@pytest.mark.parametrize("catalog", [True, False])
+def test_stream_matches_in_memory(fonts, tmp_path, compression, catalog):
+    source = tmp_path / "stream.txt"
+    source.write_text(generate.generate(seed=3, lines=400, headings=30), encoding="utf-8")
+    options = dict(font_normal=fonts[0], font_bold=fonts[1], compression=compression, catalog=catalog,
+                   deterministic=True)
+
+    expected = main.main(str(source), output=str(tmp_path / "memory.pdf"), **options)
+    streamed = main.main(str(source), output=str(tmp_path / "stream.pdf"), stream=True, **options)
+
+    assert xref_offsets_valid(streamed)
+    assert summary(streamed) == summary(expected)
+
+
+def test_stream_memory_does_not_grow_with_pages(fonts, tmp_path):
+    source = tmp_path / "flat.txt"
+    output = str(tmp_path / "flat.pdf")
+    line   = "\tThe quick brown fox jumps over the lazy dog 0123456789.\n"            # 字符集固定，字体子集不随输入增长
+    options = dict(font_normal=fonts[0], font_bold=fonts[1], output=output, stream=True)
+
+    rows = []
+    for lines in (500, 1000, 2000, 4000, 8000):                                 # 第一次只为预热（载入字体等）
+        source.write_text("".join("标题%d：\n" % n + line * (lines // 4) for n in range(4)), encoding="utf-8")
+        tracemalloc.start()
+        try:
+            main.main(str(source), **options)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        rows.append({"input_bytes": source.stat().st_size, "peak_rss": peak})
+
+    assert memory.fit(rows[1:]) < 0.1                                           # 每页只保留偏移，峰值几乎不随页数增长